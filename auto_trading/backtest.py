@@ -6,9 +6,12 @@ Created on Sat Mar 27 11:22:54 2021
 """
 
 import pprint
-import queue
 import time
 
+from dispatch import EventDispatcher
+from event import MarketEvent, SignalEvent, OrderEvent, FillEvent
+from event_bus import DequeEventBus
+
 class Backtest(object):
     """
     Enscapsulates the settings and components for carrying out
@@ -18,7 +21,8 @@ class Backtest(object):
     def __init__(
         self, csv_dir, symbol_list, initial_capital,
         heartbeat, start_date, data_handler,
-        execution_handler, portfolio, strategy
+        execution_handler, portfolio, strategy, event_bus=None,
+        recycle_events=True, fast_forward=True
     ):
         """
         Initialises the backtest.
@@ -34,6 +38,17 @@ class Backtest(object):
         portfolio - (Class) Keeps track of portfolio current
         and prior positions.
         strategy - (Class) Generates signals based on market data.
+        event_bus - The EventBus the components share, a lock-free
+        DequeEventBus by default. Use a ThreadSafeEventBus when events
+        are put from other threads, as in live trading.
+        recycle_events - Return order and fill events to their pools
+        once handled. Events of a class are no longer recycled once
+        anything else subscribes to it, so journals and loggers can
+        keep the events they receive.
+        fast_forward - Skip the bars on which no bar the strategy
+        reads has changed, if it declares an idle_lookback, adding
+        their portfolio records in one go. Off once anything else
+        subscribes to MarketEvents.
         """
         
         self.csv_dir = csv_dir
@@ -47,7 +62,10 @@ class Backtest(object):
         self.portfolio_cls = portfolio
         self.strategy_cls = strategy
         
-        self.events = queue.Queue()
+        self.events = event_bus if event_bus is not None else DequeEventBus()
+        self._recycled = set([OrderEvent, FillEvent]) if recycle_events \
+            else set()
+        self.fast_forward = fast_forward
 
         self.signals = 0
         self.orders = 0
@@ -73,12 +91,45 @@ class Backtest(object):
                                             self.initial_capital)
         self.execution_handler = self.execution_handler_cls(self.events)
         
+        # The engine's own handlers do not keep the events they get
+        self.dispatcher = EventDispatcher()
+        subscribe = self.dispatcher.subscribe
+        subscribe(MarketEvent, self.strategy.calculate_signals)
+        subscribe(MarketEvent, self.portfolio.update_timeindex)
+        subscribe(SignalEvent, self._count_signal)
+        subscribe(SignalEvent, self.portfolio.update_signal)
+        subscribe(OrderEvent, self._count_order)
+        subscribe(OrderEvent, self.execution_handler.execute_order)
+        subscribe(FillEvent, self._count_fill)
+        subscribe(FillEvent, self.portfolio.update_fill)
+    
+    def subscribe(self, event_cls, handler):
+        """
+        Registers handler(event) for every event of event_cls (or a
+        subclass), after the components already subscribed. Risk
+        managers, loggers and the like hook in here.
+        """
+        self.dispatcher.subscribe(event_cls, handler)
+        if issubclass(MarketEvent, event_cls):
+            self.fast_forward = False
+        self._recycled = set(c for c in self._recycled
+                             if not issubclass(c, event_cls))
+    
+    def _count_signal(self, event):
+        self.signals += 1
+    
+    def _count_order(self, event):
+        self.orders += 1
+    
+    def _count_fill(self, event):
+        self.fills += 1
     
     def _run_backtest(self):
         """
         Executes the backtest.
         """
         i = 0
+        lookback = getattr(self.strategy, "idle_lookback", None)
         while True:
             i += 1
             # print(i)
@@ -88,29 +139,24 @@ class Backtest(object):
             else:
                 break
             
-            # Handle the events
-            while True:
-                try:
-                    event = self.events.get(False)
-                except queue.Empty:
-                    break
-                else:
-                    if event is not None:
-                        if event.type == 'MARKET':
-                            self.strategy.calculate_signals(event)
-                            self.portfolio.update_timeindex(event)
-                            
-                        if event.type == 'SIGNAL':
-                            self.signals += 1
-                            self.portfolio.update_signal(event)
-                            
-                        if event.type == 'ORDER':
-                            self.orders += 1
-                            self.execution_handler.execute_order(event)
-                            
-                        if event.type == 'FILL':
-                            self.fills += 1
-                            self.portfolio.update_fill(event)
+            # Handle the events until the bus is empty
+            get_event = self.events.get
+            dispatch = self.dispatcher.dispatch
+            recycled = self._recycled
+            event = get_event()
+            while event is not None:
+                dispatch(event)
+                if event.__class__ in recycled:
+                    event.release()
+                event = get_event()
+            
+            # Pass over the bars that cannot change anything
+            if self.fast_forward and lookback is not None:
+                skipped = self.data_handler.unchanged_bars(lookback)
+                if skipped:
+                    self.portfolio.update_timeindex_span(
+                        self.data_handler.skip_bars(skipped)
+                    )
             
             time.sleep(self.heartbeat) 
             #In a live environment this value will be a positive number,
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:20:05 2026
+"""
+import datetime
+
+import numpy as np
+
+from bar_store import BAR_FIELDS
+
+MINUTE_NS = 60 * 10**9
+DAY_NS = 24 * 60 * MINUTE_NS
+
+OPEN = BAR_FIELDS.index('open')
+HIGH = BAR_FIELDS.index('high')
+LOW = BAR_FIELDS.index('low')
+CLOSE = BAR_FIELDS.index('close')
+ADJ_CLOSE = BAR_FIELDS.index('adj_close')
+VOLUME = BAR_FIELDS.index('volume')
+
+###bar aggregation
+def _time_ns(t):
+    """
+    Returns a datetime.time as nanoseconds after midnight.
+    """
+    return (t.hour * 60 + t.minute) * MINUTE_NS
+
+
+def bar_minutes(bar_size, session_start, session_end):
+    """
+    Returns the length of a bar in minutes. bar_size is a number
+    of minutes, or "D" for one bar per session.
+    """
+    session_minutes = (_time_ns(session_end) - _time_ns(session_start)) \
+        // MINUTE_NS + 1
+    if bar_size == "D":
+        return session_minutes
+    return int(bar_size)
+
+
+def bucket_labels(timestamps, bar_size,
+                  session_start=datetime.time(8, 46),
+                  session_end=datetime.time(13, 45)):
+    """
+    Returns, for every int64 timestamp of a session minute, the
+    timestamp of the bar it belongs to.
+
+    Buckets are anchored at the session start of each day and a bar
+    is labelled with its last minute, so 30-minute bars on the
+    08:46-13:45 session close at 09:15, 09:45, ... 13:45. A
+    shorter last bucket closes at the session end.
+    """
+    k = bar_minutes(bar_size, session_start, session_end)
+    last = (_time_ns(session_end) - _time_ns(session_start)) // MINUTE_NS
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    day = timestamps - timestamps % DAY_NS + _time_ns(session_start)
+    bucket = (timestamps - day) // MINUTE_NS // k
+    return day + np.minimum((bucket + 1) * k - 1, last) * MINUTE_NS
+
+
+def aggregate_bars(matrix, labels):
+    """
+    Aggregates consecutive rows sharing a label into one bar with
+    whole-array reductions: first open, highest high, lowest low,
+    last close and adj_close, summed volume.
+
+    Parameters:
+    matrix - (rows, len(BAR_FIELDS)) array sorted by time.
+    labels - The bar label of every row, as from bucket_labels().
+
+    Returns:
+    labels, matrix - One label and one row per aggregated bar.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    out = np.empty((0, len(BAR_FIELDS)), dtype=np.float64)
+    if len(labels) == 0:
+        return labels, out
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(labels)] - 1
+    out = np.empty((len(starts), len(BAR_FIELDS)), dtype=np.float64)
+    out[:, OPEN] = matrix[starts, OPEN]
+    out[:, HIGH] = np.maximum.reduceat(matrix[:, HIGH], starts)
+    out[:, LOW] = np.minimum.reduceat(matrix[:, LOW], starts)
+    out[:, CLOSE] = matrix[ends, CLOSE]
+    out[:, ADJ_CLOSE] = matrix[ends, ADJ_CLOSE]
+    out[:, VOLUME] = np.add.reduceat(matrix[:, VOLUME], starts)
+    return labels[starts], out
+
+
+class BarAggregator(object):
+    """
+    BarAggregator builds higher-timeframe bars from a stream of
+    minute bars of one symbol, in O(1) per update.
+
+    It uses the same buckets and labels as bucket_labels(), so a
+    live feed aggregates exactly like the load-time path. A bar is
+    completed as soon as its last minute arrives, or when the first
+    minute of a later bucket shows that it was cut short.
+    """
+
+    def __init__(self, bar_size,
+                 session_start=datetime.time(8, 46),
+                 session_end=datetime.time(13, 45)):
+        """
+        Initialises an empty aggregator.
+
+        Parameters:
+        bar_size - Minutes per bar, or "D" for one bar per session.
+        session_start - First minute of the session (inclusive).
+        session_end - Last minute of the session (inclusive).
+        """
+        self.bar_size = bar_size
+        self.session_start = session_start
+        self.session_end = session_end
+        self._k = bar_minutes(bar_size, session_start, session_end)
+        self._start_ns = _time_ns(session_start)
+        self._last = (_time_ns(session_end) - self._start_ns) // MINUTE_NS
+        self._label = None
+        self._bar = np.zeros(len(BAR_FIELDS), dtype=np.float64)
+
+    def _label_of(self, timestamp):
+        """
+        Returns the label of the bar a minute belongs to.
+        """
+        day = timestamp - timestamp % DAY_NS + self._start_ns
+        bucket = (timestamp - day) // MINUTE_NS // self._k
+        return day + min((bucket + 1) * self._k - 1, self._last) * MINUTE_NS
+
+    def update(self, timestamp, bar):
+        """
+        Adds a minute bar and returns the list of (label, values)
+        bars it completed, usually empty or a single bar.
+
+        Parameters:
+        timestamp - Epoch nanoseconds of the minute bar.
+        bar - A sequence of values in BAR_FIELDS order.
+        """
+        completed = []
+        label = self._label_of(int(timestamp))
+        if self._label is not None and label != self._label:
+            completed.append(self.flush())
+        if self._label is None:
+            self._label = label
+            self._bar[:] = bar
+        else:
+            b = self._bar
+            b[HIGH] = max(b[HIGH], bar[HIGH])
+            b[LOW] = min(b[LOW], bar[LOW])
+            b[CLOSE] = bar[CLOSE]
+            b[ADJ_CLOSE] = bar[ADJ_CLOSE]
+            b[VOLUME] += bar[VOLUME]
+        if timestamp == label:
+            completed.append(self.flush())
+        return completed
+
+    def flush(self):
+        """
+        Completes the bar being built and returns it as a
+        (label, values) tuple, or None if there is none.
+        """
+        if self._label is None:
+            return None
+        done = (self._label, self._bar.copy())
+        self._label = None
+        return done
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:41:30 2026
+"""
+import hashlib
+import json
+import os, os.path
+import tempfile
+import zipfile
+import zlib
+
+import numpy as np
+
+CACHE_VERSION = 3
+META_KEY = "__meta__"  # array holding the metadata of an entry
+
+###bar cache
+def _prefix_crc(path, size):
+    """
+    Returns the CRC-32 of the first size bytes of a file.
+    """
+    crc = 0
+    with open(path, "rb") as f:
+        while size > 0:
+            chunk = f.read(min(size, 1 << 20))
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size -= len(chunk)
+    return crc
+
+
+class BarCache(object):
+    """
+    BarCache keeps parsed and aligned bar arrays on disk so that
+    repeated backtests over the same CSV files skip the parsing.
+
+    Every entry is a single .npz file of named arrays that also
+    carries the metadata describing what it was built from: the
+    path, size and mtime of each source file and the parameters of
+    the build. An entry is only returned while all of these still
+    match, so editing a CSV rebuilds it automatically.
+
+    The file name holds a hash of the parameters and source paths,
+    so handlers with different settings sharing a cache_dir keep
+    separate entries. Each entry is written to a unique temporary
+    file and published with one rename, so concurrent writers never
+    mix up or tear an entry; an unreadable file counts as a miss.
+
+    The metadata also holds a CRC-32 of every source, so that
+    load_prefix() can tell a file that only had rows appended from
+    one whose earlier rows changed.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Initialises the cache, creating the directory if needed.
+
+        Parameters:
+        cache_dir - Directory the cache files are written to.
+        """
+        self.cache_dir = cache_dir
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, name, sources, params):
+        """
+        Returns the .npz file path of an entry, named after it and a
+        hash of its parameters and source paths.
+        """
+        key = json.dumps([sorted((k, str(v)) for k, v in params.items()),
+                          [os.path.abspath(path) for path in sources]])
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, "%s-%s.npz" % (name, digest))
+
+    def _describe(self, sources, params):
+        """
+        Returns the metadata that identifies an entry.
+        """
+        stats = []
+        for path in sources:
+            st = os.stat(path)
+            stats.append([os.path.abspath(path), st.st_size, st.st_mtime_ns])
+        return {
+            "version": CACHE_VERSION,
+            "sources": stats,
+            "params": dict((k, str(v)) for k, v in params.items()),
+        }
+
+    def _read(self, path, accept):
+        """
+        Returns (meta, arrays) of the entry at path if accept(meta)
+        is true for its metadata, None otherwise or if the file is
+        missing or unreadable.
+        """
+        try:
+            with np.load(path) as npz:
+                meta = json.loads(str(npz[META_KEY]))
+                if meta.get("version") != CACHE_VERSION or not accept(meta):
+                    return None
+                return meta, dict((k, npz[k]) for k in npz.files
+                                  if k != META_KEY)
+        except (IOError, ValueError, KeyError, EOFError,
+                zipfile.BadZipFile):
+            return None
+
+    def load(self, name, sources, params):
+        """
+        Returns a dict of the arrays stored under name, or None if
+        the entry is missing or stale.
+
+        Parameters:
+        name - The entry name, e.g. the symbol.
+        sources - The file paths the entry was built from.
+        params - A dict of the build parameters.
+        """
+        current = self._describe(sources, params)
+        found = self._read(
+            self._path(name, sources, params),
+            lambda meta: meta["sources"] == current["sources"] and
+            meta["params"] == current["params"]
+        )
+        return found[1] if found is not None else None
+
+    def load_prefix(self, name, sources, params):
+        """
+        Returns (arrays, offsets) for an entry whose sources have
+        only had data appended since it was saved, where offsets are
+        the sizes in bytes the sources had then. Returns None if the
+        entry is missing, was built with other params, or if any
+        byte before an offset changed.
+
+        Unlike load() this reads the old part of every source once
+        to check it, which is still far cheaper than parsing it.
+        """
+        current = self._describe(sources, params)
+
+        def appended(meta):
+            if meta["params"] != current["params"] or \
+                    len(meta["sources"]) != len(current["sources"]):
+                return False
+            for path, old, new, crc in zip(sources, meta["sources"],
+                                           current["sources"], meta["crc"]):
+                if old[0] != new[0] or new[1] < old[1] or \
+                        _prefix_crc(path, old[1]) != crc:
+                    return False
+            return True
+
+        found = self._read(self._path(name, sources, params), appended)
+        if found is None:
+            return None
+        meta, arrays = found
+        return arrays, [old[1] for old in meta["sources"]]
+
+    def save(self, name, sources, params, arrays):
+        """
+        Stores the arrays under name together with the metadata of
+        their sources, in one file written under a unique temporary
+        name and then moved into place.
+        """
+        meta = self._describe(sources, params)
+        meta["crc"] = [_prefix_crc(path, st[1])
+                       for path, st in zip(sources, meta["sources"])]
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **dict(arrays, **{META_KEY: json.dumps(meta)}))
+            os.replace(tmp, self._path(name, sources, params))
+        except BaseException:
+            os.remove(tmp)
+            raise
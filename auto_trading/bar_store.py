@@ -0,0 +1,444 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 09:05:12 2026
+"""
+from collections import namedtuple
+import json
+import os, os.path
+
+import numpy as np
+import pandas as pd
+
+###bar store
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'adj_close', 'volume')
+
+Bar = namedtuple('Bar', BAR_FIELDS)
+
+
+def _field_columns(val_types):
+    """
+    Returns the matrix column selector for a list of field names.
+    A run of adjacent names in BAR_FIELDS order gives a slice, so
+    indexing with it is a view; any other selection is a list.
+    """
+    if val_types is None:
+        return slice(None)
+    cols = [BAR_FIELDS.index(f) for f in val_types]
+    if cols == list(range(cols[0], cols[0] + len(cols))):
+        return slice(cols[0], cols[0] + len(cols))
+    return cols
+
+
+class BarStore(object):
+    """
+    BarStore keeps the bars of one symbol in columnar form: a
+    Fortran-ordered float64 matrix with one contiguous column per
+    OHLCV field, plus an int64 array of nanosecond timestamps.
+
+    Bars are addressed by their integer position, so a data handler
+    only has to move a cursor forward instead of building a pandas
+    Series for every bar. The arrays are read-only and every window
+    handed out is a view into them.
+    """
+
+    def __init__(self, timestamps, matrix):
+        """
+        Initialises the store from already aligned arrays.
+
+        Parameters:
+        timestamps - int64 array of epoch nanoseconds.
+        matrix - A (len(timestamps), len(BAR_FIELDS)) array with
+        one column per field in BAR_FIELDS order.
+        """
+        self.timestamps = np.ascontiguousarray(timestamps, dtype=np.int64).view()
+        self.matrix = np.asfortranarray(matrix, dtype=np.float64).view()
+        if self.matrix.shape != (len(self.timestamps), len(BAR_FIELDS)):
+            raise ValueError(
+                "Bar matrix has shape %s, expected %s" %
+                (self.matrix.shape, (len(self.timestamps), len(BAR_FIELDS)))
+            )
+        self.timestamps.flags.writeable = False
+        self.matrix.flags.writeable = False
+        self.fields = dict(
+            (f, self.matrix[:, j]) for j, f in enumerate(BAR_FIELDS)
+        )
+
+    @classmethod
+    def from_fields(cls, timestamps, fields):
+        """
+        Builds a store from a dict mapping every name in BAR_FIELDS
+        to an array with the same length as timestamps.
+        """
+        matrix = np.empty((len(timestamps), len(BAR_FIELDS)),
+                          dtype=np.float64, order='F')
+        for j, f in enumerate(BAR_FIELDS):
+            matrix[:, j] = fields[f]
+        return cls(timestamps, matrix)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Builds a store from a DataFrame indexed on datetime with
+        one column per name in BAR_FIELDS.
+        """
+        timestamps = np.asarray(df.index.values, dtype='datetime64[ns]').view(np.int64)
+        return cls(timestamps, df[list(BAR_FIELDS)].to_numpy(dtype=np.float64))
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Builds a store from a dict holding a "timestamps" array and
+        one array per name in BAR_FIELDS, e.g. as returned by arrays().
+        """
+        return cls.from_fields(arrays["timestamps"], arrays)
+
+    def arrays(self):
+        """
+        Returns the timestamps and field arrays in a single dict.
+        """
+        d = dict(self.fields)
+        d["timestamps"] = self.timestamps
+        return d
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def datetime(self, i):
+        """
+        Returns the timestamp of the bar at position i.
+        """
+        return pd.Timestamp(self.timestamps[i])
+
+    def bar(self, i):
+        """
+        Returns the bar at position i as a Bar namedtuple, so
+        getattr(bar, val_type) keeps working for callers.
+        """
+        return Bar(*self.matrix[i])
+
+    def value(self, val_type, i):
+        """
+        Returns a single field value of the bar at position i.
+        """
+        return self.fields[val_type][i]
+
+    def values(self, val_type, start, stop):
+        """
+        Returns a read-only view of the field values of the bars
+        in [start, stop).
+        """
+        return self.fields[val_type][start:stop]
+
+    def values_matrix(self, start, stop, val_types=None):
+        """
+        Returns the bars in [start, stop) as an (N, fields) array,
+        all of BAR_FIELDS by default. This is a read-only view unless
+        val_types are not adjacent in BAR_FIELDS order.
+        """
+        return self.matrix[start:stop, _field_columns(val_types)]
+
+
+class SharedBarStore(object):
+    """
+    SharedBarStore is a read-only directory of raw .npy files that
+    several backtest processes can memory-map at the same time, so
+    the operating system keeps a single physical copy of the bars.
+
+    The layout is one timestamps.npy shared by all symbols, one
+    Fortran-ordered <symbol>.npy bar matrix per symbol and a
+    manifest.json that is written last and lists the symbols.
+    """
+
+    def __init__(self, store_dir):
+        """
+        Opens an existing store written by SharedBarStore.write().
+
+        Parameters:
+        store_dir - Directory of the shared store.
+        """
+        self.store_dir = store_dir
+        with open(os.path.join(self.store_dir, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.symbol_list = self.manifest["symbols"]
+        self.timestamps = np.load(
+            os.path.join(self.store_dir, "timestamps.npy"), mmap_mode="r"
+        )
+
+    @staticmethod
+    def write(store_dir, symbol_data):
+        """
+        Writes the BarStores of an already loaded data handler into
+        store_dir. All stores must share the same timestamps, which
+        is the case for the aligned HistoricCSVDataHandler.
+
+        Parameters:
+        store_dir - Directory to create the store in.
+        symbol_data - A dict of symbol to BarStore.
+        """
+        symbols = list(symbol_data)
+        timestamps = symbol_data[symbols[0]].timestamps
+        for s in symbols:
+            if not np.array_equal(symbol_data[s].timestamps, timestamps):
+                raise ValueError("Symbol %s is not aligned to %s" %
+                                 (s, symbols[0]))
+        if not os.path.isdir(store_dir):
+            os.makedirs(store_dir)
+        np.save(os.path.join(store_dir, "timestamps.npy"), timestamps)
+        for s in symbols:
+            np.save(os.path.join(store_dir, "%s.npy" % s),
+                    symbol_data[s].matrix)
+        with open(os.path.join(store_dir, "manifest.json"), "w") as f:
+            json.dump({"symbols": symbols, "fields": list(BAR_FIELDS)}, f)
+
+    def attach(self, symbol):
+        """
+        Returns a BarStore whose arrays are read-only memory maps of
+        the file of symbol. Nothing is parsed or copied.
+        """
+        if symbol not in self.symbol_list:
+            raise KeyError(symbol)
+        matrix = np.load(os.path.join(self.store_dir, "%s.npy" % symbol),
+                         mmap_mode="r")
+        return BarStore(self.timestamps, matrix)
+
+
+class BarRingBuffer(object):
+    """
+    BarRingBuffer keeps the last `capacity` bars of one symbol in
+    fixed-size arrays, so a handler that receives bars one at a
+    time uses O(lookback) memory instead of O(history).
+
+    Bars are addressed by the same absolute positions as in a
+    BarStore (0 for the first bar ever appended); only the last
+    `capacity` positions are available. Every value is written twice,
+    at p and p + capacity, so any window of up to `capacity` recent
+    bars is one contiguous slice. Readers get read-only views that
+    stay valid until the next append.
+    """
+
+    def __init__(self, capacity):
+        """
+        Initialises an empty buffer.
+
+        Parameters:
+        capacity - The maximum number of bars kept.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.count = 0  # number of bars appended so far
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._matrix = np.zeros((2 * capacity, len(BAR_FIELDS)),
+                                dtype=np.float64, order='F')
+        # Read-only views handed out to readers
+        self.timestamps = self._timestamps.view()
+        self.timestamps.flags.writeable = False
+        self.matrix = self._matrix.view()
+        self.matrix.flags.writeable = False
+        self.fields = dict(
+            (f, self.matrix[:, j]) for j, f in enumerate(BAR_FIELDS)
+        )
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp, bar):
+        """
+        Appends a bar, overwriting the oldest one once full.
+
+        Parameters:
+        timestamp - Epoch nanoseconds of the bar.
+        bar - A sequence of values in BAR_FIELDS order.
+        """
+        p = self.count % self.capacity
+        q = p + self.capacity
+        self._timestamps[p] = self._timestamps[q] = timestamp
+        self._matrix[p] = self._matrix[q] = bar
+        self.count += 1
+
+    def _slot(self, i):
+        """
+        Returns the array index holding absolute position i.
+        """
+        if i < 0 or i >= self.count or i < self.count - self.capacity:
+            raise IndexError("Bar %d is outside the buffer" % i)
+        return i % self.capacity + self.capacity
+
+    def datetime(self, i):
+        """
+        Returns the timestamp of the bar at position i.
+        """
+        return pd.Timestamp(self.timestamps[self._slot(i)])
+
+    def bar(self, i):
+        """
+        Returns the bar at position i as a Bar namedtuple.
+        """
+        return Bar(*self.matrix[self._slot(i)])
+
+    def value(self, val_type, i):
+        """
+        Returns a single field value of the bar at position i.
+        """
+        return self.fields[val_type][self._slot(i)]
+
+    def _window(self, start, stop):
+        """
+        Returns the array slice holding positions [start, stop),
+        with start clamped to the oldest bar kept.
+        """
+        start = max(start, self.count - self.capacity, 0)
+        if stop <= start:
+            return slice(0, 0)
+        end = self._slot(stop - 1) + 1
+        return slice(end - (stop - start), end)
+
+    def values(self, val_type, start, stop):
+        """
+        Returns a read-only contiguous view of the field values of
+        the bars in [start, stop).
+        """
+        return self.fields[val_type][self._window(start, stop)]
+
+    def values_matrix(self, start, stop, val_types=None):
+        """
+        Returns the bars in [start, stop) as an (N, fields) array,
+        all of BAR_FIELDS by default. This is a read-only view unless
+        val_types are not adjacent in BAR_FIELDS order.
+        """
+        return self.matrix[self._window(start, stop), _field_columns(val_types)]
+
+
+class CompactBarStore(object):
+    """
+    CompactBarStore holds the same bars as a BarStore in half the
+    memory: open, high, low and close as int32 counts of
+    the exchange tick, volume as int32, and adj_close only when it
+    differs from close (for the TAIFEX files it never does).
+
+    The getters have the same signatures as those of BarStore and
+    return float64 values, so prices are only converted back at the
+    API boundary. Windows are decoded into new arrays rather than
+    returned as views.
+    """
+
+    def __init__(self, timestamps, ticks, volume, tick_size=1.0,
+                 adj_ticks=None):
+        """
+        Initialises the store from already encoded arrays.
+
+        Parameters:
+        timestamps - int64 array of epoch nanoseconds.
+        ticks - A (len(timestamps), 4) integer array of open, high,
+        low and close in units of tick_size.
+        volume - Integer array of volumes.
+        tick_size - Price of one tick.
+        adj_ticks - Optional adj_close in ticks, close if None.
+        """
+        self.timestamps = np.ascontiguousarray(timestamps, dtype=np.int64).view()
+        self.ticks = np.asfortranarray(ticks, dtype=np.int32).view()
+        self.volume = np.ascontiguousarray(volume, dtype=np.int32).view()
+        self.adj_ticks = None
+        if adj_ticks is not None:
+            self.adj_ticks = np.ascontiguousarray(adj_ticks, dtype=np.int32).view()
+        self.tick_size = float(tick_size)
+        # Dividing by the ticks per unit keeps decimal ticks such as
+        # 0.05 exact, where multiplying by tick_size would not
+        self._per_unit = 1.0 / self.tick_size
+        for a in (self.timestamps, self.ticks, self.volume, self.adj_ticks):
+            if a is not None:
+                a.flags.writeable = False
+        self.raw = dict(
+            (f, self.ticks[:, j]) for j, f in enumerate(BAR_FIELDS[:4])
+        )
+        self.raw['adj_close'] = self.raw['close'] if adj_ticks is None \
+            else self.adj_ticks
+        self.raw['volume'] = self.volume
+
+    @classmethod
+    def from_store(cls, store, tick_size=1.0):
+        """
+        Encodes a BarStore. Raises ValueError if a price is not a
+        whole number of ticks or a volume does not fit in int32.
+        """
+        per_unit = 1.0 / float(tick_size)
+        prices = store.matrix[:, :5]
+        ticks = np.rint(prices * per_unit)
+        if not np.array_equal(ticks / per_unit, prices) or \
+                np.abs(ticks).max(initial=0) > np.iinfo(np.int32).max:
+            raise ValueError("Prices are not whole ticks of %s" % tick_size)
+        volume = store.fields['volume']
+        if not np.array_equal(np.rint(volume), volume) or \
+                np.abs(volume).max(initial=0) > np.iinfo(np.int32).max:
+            raise ValueError("Volumes do not fit in int32")
+        adj_ticks = None
+        if not np.array_equal(ticks[:, 4], ticks[:, 3]):
+            adj_ticks = ticks[:, 4]
+        return cls(store.timestamps, ticks[:, :4], volume, tick_size,
+                   adj_ticks)
+
+    def to_store(self):
+        """
+        Decodes every bar into a float64 BarStore.
+        """
+        return BarStore(self.timestamps,
+                        self.values_matrix(0, len(self.timestamps)))
+
+    @property
+    def nbytes(self):
+        """
+        Bytes held by the arrays of the store.
+        """
+        return sum(a.nbytes for a in (self.timestamps, self.ticks,
+                                      self.volume, self.adj_ticks)
+                   if a is not None)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def _decode(self, val_type, raw):
+        """
+        Converts raw values of a field to float64.
+        """
+        if val_type == 'volume':
+            return np.float64(raw) if np.ndim(raw) == 0 \
+                else raw.astype(np.float64)
+        return raw / self._per_unit
+
+    def datetime(self, i):
+        """
+        Returns the timestamp of the bar at position i.
+        """
+        return pd.Timestamp(self.timestamps[i])
+
+    def bar(self, i):
+        """
+        Returns the bar at position i as a Bar namedtuple.
+        """
+        return Bar(*(self._decode(f, self.raw[f][i]) for f in BAR_FIELDS))
+
+    def value(self, val_type, i):
+        """
+        Returns a single field value of the bar at position i.
+        """
+        return self._decode(val_type, self.raw[val_type][i])
+
+    def values(self, val_type, start, stop):
+        """
+        Returns the field values of the bars in [start, stop) as a
+        new float64 array.
+        """
+        return self._decode(val_type, self.raw[val_type][start:stop])
+
+    def values_matrix(self, start, stop, val_types=None):
+        """
+        Returns the bars in [start, stop) as a new (N, fields)
+        float64 array, all of BAR_FIELDS by default.
+        """
+        if val_types is None:
+            val_types = BAR_FIELDS
+        n = len(self.timestamps[start:stop])
+        out = np.empty((n, len(val_types)), dtype=np.float64, order='F')
+        for j, f in enumerate(val_types):
+            out[:, j] = self.values(f, start, stop)
+        return out
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:48:19 2026
+"""
+import datetime
+import os, os.path
+
+import numpy as np
+import pandas as pd
+
+from bar_aggregation import DAY_NS, bucket_labels
+from bar_store import BAR_FIELDS, BarStore
+from data import HistoricCSVDataHandler, _select_bars
+
+MONTH_CODES = "ABCDEFGHIJKL"  # TAIFEX futures month codes, A = January
+PRICE_COLUMNS = [BAR_FIELDS.index(f)
+                 for f in ('open', 'high', 'low', 'close', 'adj_close')]
+CLOSE = BAR_FIELDS.index('close')
+
+###continuous futures
+def contract_expiry(symbol, first_date):
+    """
+    Returns the expiry date of a TAIFEX futures contract such as
+    TXFD1: the third Wednesday of its delivery month. The single year
+    digit is resolved to the first matching year not before the
+    contract's first bar.
+
+    Parameters:
+    symbol - Contract symbol ending in a month code and a year digit.
+    first_date - Date of the contract's first bar.
+    """
+    month = MONTH_CODES.index(symbol[-2]) + 1
+    year = first_date.year - first_date.year % 10 + int(symbol[-1])
+    if year < first_date.year:
+        year += 10
+    first = datetime.date(year, month, 1)
+    # weekday() of Wednesday is 2
+    return first + datetime.timedelta(days=(2 - first.weekday()) % 7 + 14)
+
+
+class ContinuousFuturesDataHandler(HistoricCSVDataHandler):
+    """
+    ContinuousFuturesDataHandler stitches the contract months of a
+    future (e.g. TXFC2, TXFD1, TXFE1, TXFL1) into one continuous
+    symbol, so strategies trade a single liquid series instead of
+    each month padded over the whole calendar.
+
+    The contracts are loaded with their own bars only. A roll
+    schedule is then computed once, by daily volume crossover or by
+    days before expiry, and cached with the bars. Each roll takes
+    effect at the session open of a trading day and only uses
+    information from before that day. Price columns are back-adjusted
+    (the gap is added to the history) or ratio-adjusted (the history
+    is scaled) so the series has no jump at the rolls.
+    """
+
+    def __init__(self, events, csv_dir, symbol_list, symbol="TXF",
+                 roll_method="volume", roll_days=1, adjustment="back",
+                 **kwargs):
+        """
+        Initialises the continuous futures data handler.
+
+        Parameters:
+        events - The Event Queue.
+        csv_dir - Absolute directory path to the CSV files.
+        symbol_list - The contract month symbols to stitch.
+        symbol - Name of the continuous symbol.
+        roll_method - "volume" to roll once another contract traded
+        more on the previous day, "expiry" to hold the nearest
+        contract until roll_days business days before its expiry.
+        roll_days - Business days before expiry for "expiry".
+        adjustment - "back", "ratio" or None for no adjustment.
+
+        The other keyword arguments are those of
+        HistoricCSVDataHandler, except shared_store_dir.
+        """
+        self.symbol = symbol
+        self.contract_list = list(symbol_list)
+        self.roll_method = roll_method
+        self.roll_days = roll_days
+        self.adjustment = adjustment
+        HistoricCSVDataHandler.__init__(self, events, csv_dir,
+                                        self.contract_list, **kwargs)
+
+    _align_bars = staticmethod(_select_bars)
+
+    def _cache_params(self):
+        """
+        Returns the parameters the cached arrays depend on.
+        """
+        params = HistoricCSVDataHandler._cache_params(self)
+        params["alignment"] = "merge"
+        return params
+
+    def _open_convert_csv_files(self):
+        """
+        Loads every contract month with its own bars, then builds
+        the roll schedule and the continuous series.
+        """
+        HistoricCSVDataHandler._open_convert_csv_files(self)
+        self.contract_data = self.symbol_data
+
+        grid = np.asarray(self._session_minutes().values,
+                          dtype='datetime64[ns]').view(np.int64)
+        if self.bar_size != 1:
+            grid = np.unique(bucket_labels(grid, self.bar_size,
+                                           self.calendar.session_start,
+                                           self.calendar.session_end))
+        roll_ts, roll_contract = self._load_roll_schedule(grid)
+        self.roll_schedule = [
+            (pd.Timestamp(t), self.contract_list[c])
+            for t, c in zip(roll_ts, roll_contract)
+        ]
+        self.symbol_list = [self.symbol]
+        self.symbol_data = {
+            self.symbol: self._stitch(grid, roll_ts, roll_contract)
+        }
+
+    def _load_roll_schedule(self, grid):
+        """
+        Returns the roll schedule from the cache, computing and
+        storing it on a miss.
+        """
+        params = self._cache_params()
+        params.update(contracts=",".join(self.contract_list),
+                      roll_method=self.roll_method, roll_days=self.roll_days)
+        sources = [os.path.join(self.csv_dir, '%s.csv' % c)
+                   for c in self.contract_list] + [self.calendar.standard_csv]
+        name = "_roll_%s" % self.symbol
+        if self.cache is not None:
+            arrays = self.cache.load(name, sources, params)
+            if arrays is not None:
+                return arrays["roll_ts"], arrays["roll_contract"]
+        roll_ts, roll_contract = self._roll_schedule(grid)
+        if self.cache is not None:
+            self.cache.save(name, sources, params, {
+                "roll_ts": roll_ts, "roll_contract": roll_contract
+            })
+        return roll_ts, roll_contract
+
+    def _roll_schedule(self, grid):
+        """
+        Returns the roll schedule as two arrays: the grid timestamp
+        each segment starts at and the index of its contract in
+        contract_list. The first segment starts at the first bar.
+        """
+        day_of = grid - grid % DAY_NS
+        days, day_start = np.unique(day_of, return_index=True)
+        stores = [self.contract_data[c] for c in self.contract_list]
+
+        # Daily volume and first trading day of every contract
+        volume = np.zeros((len(days), len(stores)))
+        first_day = np.full(len(stores), np.iinfo(np.int64).max)
+        for j, st in enumerate(stores):
+            if len(st) == 0:
+                continue
+            bar_days = st.timestamps - st.timestamps % DAY_NS
+            pos = np.searchsorted(days, bar_days)
+            pos = np.minimum(pos, len(days) - 1)
+            volume[:, j] = np.bincount(pos, weights=st.fields['volume'],
+                                       minlength=len(days))
+            first_day[j] = bar_days[0]
+        expiry = np.empty(len(stores), dtype=np.int64)
+        roll_out = np.empty(len(stores), dtype=np.int64)
+        for j, c in enumerate(self.contract_list):
+            listed = first_day[j] if len(stores[j]) else days[0]
+            e = contract_expiry(c, pd.Timestamp(listed))
+            expiry[j] = pd.Timestamp(e).value
+            roll_out[j] = pd.Timestamp(np.busday_offset(
+                np.datetime64(e, 'D'), -self.roll_days, roll='backward'
+            )).value
+
+        current = int(np.argmin(first_day))
+        active = np.empty(len(days), dtype=np.int64)
+        for d in range(len(days)):
+            live = (first_day < days[d]) & (days[d] <= expiry)
+            if self.roll_method == "expiry":
+                live &= days[d] < roll_out
+                if live.any():
+                    current = int(np.flatnonzero(live)[np.argmin(expiry[live])])
+            elif d > 0:
+                prev = np.where(live, volume[d - 1], -1.0)
+                if not live[current] or prev.max() > prev[current]:
+                    if live.any():
+                        current = int(np.argmax(prev))
+            active[d] = current
+
+        change = np.r_[True, active[1:] != active[:-1]]
+        return grid[day_start[change]], active[change]
+
+    def _stitch(self, grid, roll_ts, roll_contract):
+        """
+        Builds the continuous BarStore on grid from the roll
+        schedule, forward-filling each contract within its segment
+        and adjusting the prices of earlier segments.
+        """
+        starts = np.searchsorted(grid, roll_ts)
+        ends = np.r_[starts[1:], len(grid)]
+        matrix = np.zeros((len(grid), len(BAR_FIELDS)))
+        for a, b, c in zip(starts, ends, roll_contract):
+            st = self.contract_data[self.contract_list[c]]
+            idx = np.searchsorted(st.timestamps, grid[a:b], side='right') - 1
+            has_bar = idx >= 0
+            matrix[a:b][has_bar] = st.matrix[idx[has_bar]]
+
+        if self.adjustment is not None:
+            # Walk the rolls backwards, adjusting everything before each
+            for i in range(len(starts) - 1, 0, -1):
+                old = self._close_before(roll_contract[i - 1], roll_ts[i])
+                new = self._close_before(roll_contract[i], roll_ts[i])
+                if old == 0.0 or new == 0.0:
+                    continue
+                before = matrix[:starts[i]]
+                traded = before[:, CLOSE] != 0.0
+                for j in PRICE_COLUMNS:
+                    if self.adjustment == "ratio":
+                        before[traded, j] *= new / old
+                    else:
+                        before[traded, j] += new - old
+        return BarStore(grid, matrix)
+
+    def _close_before(self, contract, timestamp):
+        """
+        Returns the last close of a contract before timestamp, or
+        its first close if it had no bar before then.
+        """
+        st = self.contract_data[self.contract_list[contract]]
+        if len(st) == 0:
+            return 0.0
+        i = max(np.searchsorted(st.timestamps, timestamp, side='left') - 1, 0)
+        return st.fields['close'][i]
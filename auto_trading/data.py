@@ -6,7 +6,17 @@ Created on Sat Mar 27 10:24:01 2021
 """
 from abc import ABCMeta, abstractmethod
 from event import MarketEvent
+from bar_store import BAR_FIELDS, BarStore, SharedBarStore, BarRingBuffer, \
+    CompactBarStore
+from bar_cache import BarCache
+from features import FeatureStore
+from bar_aggregation import DAY_NS, BarAggregator, _time_ns, aggregate_bars, \
+    bucket_labels
+from session_calendar import SessionCalendar
 
+import concurrent.futures
+import functools
+import heapq
 import os, os.path
 import numpy as np
 import pandas as pd
@@ -65,6 +75,64 @@ class DataHandler(object):
         latest_symbol list, or N-k if less available.
         """
         raise NotImplementedError("Should implement get_latest_bars_values()")
+
+    @abstractmethod
+    def get_latest_bars_fields(self, symbol, N=1, val_types=None):
+        """
+        Returns the last N bars as an (N, fields) array of the
+        requested fields, or N-k rows if less available.
+        """
+        raise NotImplementedError("Should implement get_latest_bars_fields()")
+
+    def get_latest_values(self, val_type, symbols=None):
+        """
+        Returns a vector of the latest val_type value of every
+        symbol in symbols (symbol_list by default), NaN for a symbol
+        without a bar yet.
+        """
+        if symbols is None:
+            symbols = self.symbol_list
+        out = np.full(len(symbols), np.nan)
+        for k, s in enumerate(symbols):
+            try:
+                out[k] = self.get_latest_bar_value(s, val_type)
+            except IndexError:
+                pass
+        return out
+
+    def get_latest_values_matrix(self, val_type, N=1, symbols=None):
+        """
+        Returns a (symbols, N) array of the last N val_type values
+        of every symbol in symbols (symbol_list by default), oldest
+        first. It has as many columns as the longest history
+        available, up to N; shorter rows are padded with NaN on the
+        left.
+        """
+        if symbols is None:
+            symbols = self.symbol_list
+        rows = [self.get_latest_bars_values(s, val_type, N) for s in symbols]
+        width = max([len(r) for r in rows] + [0])
+        out = np.full((len(symbols), width), np.nan)
+        for k, r in enumerate(rows):
+            if len(r):
+                out[k, width - len(r):] = r
+        return out
+
+    def unchanged_bars(self, lookback):
+        """
+        Returns how many of the upcoming bars leave the last
+        lookback bars of every symbol exactly as they are now, so
+        that they may be passed over with skip_bars(). 0, none of
+        them, by default.
+        """
+        return 0
+
+    def skip_bars(self, n):
+        """
+        Advances over the next n bars without sending MarketEvents
+        and returns their datetimes.
+        """
+        raise NotImplementedError("Should implement skip_bars()")
         
     @abstractmethod
     def update_bars(self):
@@ -75,6 +143,133 @@ class DataHandler(object):
         """
         raise NotImplementedError("Should implement update_bars()")
 
+CSV_COLUMNS = [
+    'datetime', 'open', 'high',
+    'low', 'close', 'adj_close', 'volume'
+]
+
+def _read_bar_csv(path):
+    """
+    Parses a bar CSV file into a DataFrame sorted by date.
+    """
+    # Load the CSV file with no header information, indexed on date
+    df = pd.io.parsers.read_csv(
+        path, header=0, index_col=0, parse_dates=True, names=CSV_COLUMNS
+    )
+    return df if df.index.is_monotonic_increasing else df.sort_index()
+
+def _read_csv_tail(path, offset):
+    """
+    Parses the rows a bar CSV file has after byte offset, which
+    must be the start of a line, into a DataFrame in file order.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        if not f.read(1):
+            return pd.DataFrame(
+                columns=CSV_COLUMNS[1:], dtype=np.float64,
+                index=pd.DatetimeIndex([], name='datetime')
+            )
+        f.seek(-1, 1)
+        return pd.io.parsers.read_csv(
+            f, header=None, index_col=0, parse_dates=True, names=CSV_COLUMNS
+        )
+
+def _read_last_bar(path):
+    """
+    Returns the last row of a bar CSV file as a one-row DataFrame,
+    or an empty one if the file has no rows, reading only the end
+    of the file.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(size - 4096, 0))
+        block = f.read()
+    # Start of the last non-empty line
+    end = len(block.rstrip(b"\r\n"))
+    start = block.rfind(b"\n", 0, end) + 1
+    if start == 0 and len(block) == size:
+        # Only the header line
+        return _read_csv_tail(path, size)
+    return _read_csv_tail(path, size - len(block) + start)
+
+def _window_bars(df, start_date, end_date):
+    """
+    Returns the rows of a sorted bar DataFrame that aligning it to
+    [start_date, end_date] needs: the bars inside the window plus
+    those of the day of the last bar before it. Padding carries
+    that last bar forward, and aggregation needs its whole day to
+    rebuild the bar it belongs to. Both ends are found by binary
+    search on the index, so only that slice is copied.
+    """
+    ts = np.asarray(df.index.values, dtype='datetime64[ns]').view(np.int64)
+    first = np.searchsorted(ts, pd.Timestamp(start_date).value, side='left')
+    last = np.searchsorted(ts, pd.Timestamp(end_date).value, side='right')
+    if first > 0:
+        first = np.searchsorted(ts, ts[first - 1] - ts[first - 1] % DAY_NS,
+                                side='left')
+    return df.iloc[first:last]
+
+def _pad_bars(df, time_index):
+    """
+    Forward-fills the bars of a symbol onto the session grid,
+    returning a BarStore.
+    """
+    # Reindex the dataframe and keep only its columns
+    return BarStore.from_dataframe(
+        df.reindex(index=time_index,method="pad").fillna(0)
+    )
+
+def _select_bars(df, time_index):
+    """
+    Keeps the bars of a symbol that fall on the session grid,
+    without filling the minutes in between.
+    """
+    return BarStore.from_dataframe(df[df.index.isin(time_index)].fillna(0))
+
+def _aggregate_bars(df, time_index, align, bar_size, session_start,
+                    session_end):
+    """
+    Aggregates the bars of a symbol that fall on the session grid
+    into bar_size bars, then aligns them with align() onto the grid
+    of aggregated bar labels.
+
+    Session minutes before the grid (the day of the bar padding
+    carries in, see _window_bars()) are aggregated as well, so the
+    bars carried into the grid, and a first bar that starts before
+    it, are the same as with the full history.
+    """
+    grid = np.asarray(time_index.values, dtype='datetime64[ns]').view(np.int64)
+    coarse = np.unique(bucket_labels(grid, bar_size, session_start,
+                                     session_end))
+    ts = np.asarray(df.index.values, dtype='datetime64[ns]').view(np.int64)
+    minute = ts % DAY_NS
+    before = (ts < grid[0]) if len(grid) else np.zeros(len(ts), dtype=bool)
+    before &= (minute >= _time_ns(session_start)) & \
+        (minute <= _time_ns(session_end))
+    df = df[before | df.index.isin(time_index)]
+    ts = np.asarray(df.index.values, dtype='datetime64[ns]').view(np.int64)
+    labels, matrix = aggregate_bars(
+        df[list(BAR_FIELDS)].to_numpy(dtype=np.float64),
+        bucket_labels(ts, bar_size, session_start, session_end)
+    )
+    bars = pd.DataFrame(matrix, columns=BAR_FIELDS,
+                        index=pd.DatetimeIndex(labels.view('datetime64[ns]')))
+    return align(bars, pd.DatetimeIndex(coarse.view('datetime64[ns]')))
+
+def _load_bar_csv(path, time_index, align):
+    """
+    Parses a bar CSV file and aligns it with align(df, time_index),
+    after cutting it down to the span of time_index. Module level so
+    that it can run in a process pool.
+    """
+    df = _read_bar_csv(path)
+    if len(time_index) > 0:
+        df = _window_bars(df, time_index[0], time_index[-1])
+    return align(df, time_index)
+
+
 class HistoricCSVDataHandler(DataHandler):
     """
     HistoricCSVDataHandler is designed to read CSV files for
@@ -83,7 +278,15 @@ class HistoricCSVDataHandler(DataHandler):
     trading interface.
     """
     
-    def __init__(self, events, csv_dir, symbol_list):
+    _align_bars = staticmethod(_pad_bars)
+    _load_bars = staticmethod(_load_bar_csv)
+    
+    def __init__(self, events, csv_dir, symbol_list,
+                 data_start_date=datetime.datetime(2020,12,17,8,46,0),
+                 data_end_date=datetime.datetime(2021,3,31,12,8,0),
+                 calendar=None, cache_dir=None, shared_store_dir=None,
+                 load_workers=1, load_pool="thread", bar_size=1,
+                 tick_size=None):
         """
         Initialises the historic data handler by requesting
         the location of the CSV files and a list of symbols.
@@ -95,165 +298,848 @@ class HistoricCSVDataHandler(DataHandler):
         events - The Event Queue.
         csv_dir - Absolute directory path to the CSV files.
         symbol_list - A list of symbol strings.
+        data_start_date - First minute of the session grid.
+        data_end_date - Last minute of the session grid. Each file
+        is cut down to this window before it is aligned, so a short
+        backtest only copies and pads the bars it replays.
+        calendar - An optional SessionCalendar, built from
+        TXFF1.csv if not given.
+        cache_dir - Optional directory for the on-disk bar cache.
+        shared_store_dir - Optional SharedBarStore directory. When
+        given, the bars are memory-mapped from it instead of read
+        from csv_dir, so parallel workers share one copy.
+        load_workers - Number of symbols parsed and aligned at once.
+        load_pool - "thread" or "process", the kind of pool used
+        when load_workers is more than one.
+        bar_size - Minutes per bar (e.g. 5, 15, 30, 60), or "D" for
+        one bar per session. Minute bars are aggregated at load time.
+        tick_size - Optional price of one exchange tick (1.0 for
+        TXF). When given, the bars are held in CompactBarStores as
+        int32 ticks and volumes and only converted to float by the
+        getters.
         """
         self.events = events
         self.csv_dir = csv_dir
         self.symbol_list = symbol_list
+        self.data_start_date = data_start_date
+        self.data_end_date = data_end_date
+        self.calendar = calendar if calendar is not None else SessionCalendar()
+        self.cache = BarCache(cache_dir) if cache_dir is not None else None
+        self.load_workers = load_workers
+        self.load_pool = load_pool
+        self.bar_size = bar_size
+        self.tick_size = tick_size
         
         self.symbol_data = {}
-        self.latest_symbol_data = {}
+        self._panels = {}  # field name to (symbols, bars) array, or None
+        self._features = None
+        self._repeats = None  # per bar, run of bars equal to the one before
+        self.bar_index = -1  # position of the latest bar, -1 before the first update
         self.continue_backtest = True
         
-        self._open_convert_csv_files()
+        if shared_store_dir is not None:
+            self._attach_shared_store(shared_store_dir)
+        else:
+            self._open_convert_csv_files()
+        if self.tick_size is not None:
+            self._compact_stores()
+        if shared_store_dir is not None or self.tick_size is not None:
+            # A float64 panel would copy the memory-mapped or int32 bars
+            self._panels = None
 
     
+    def _cache_params(self):
+        """
+        Returns the parameters the cached arrays depend on.
+        """
+        return {
+            "standard_csv": self.calendar.standard_csv,
+            "session_start": self.calendar.session_start,
+            "session_end": self.calendar.session_end,
+            "data_start_date": self.data_start_date,
+            "data_end_date": self.data_end_date,
+            "bar_size": self.bar_size,
+        }
+
+    def _cache_sources(self, symbol):
+        """
+        Returns the files the cached arrays of a symbol depend on.
+        """
+        return [self._symbol_source(symbol), self.calendar.standard_csv]
+
+    def _session_minutes(self):
+        """
+        Returns the session grid, from the cache when possible.
+        """
+        found = None
+        if self.cache is not None:
+            sources = [self.calendar.standard_csv]
+            arrays = self.cache.load("_calendar", sources, self._cache_params())
+            if arrays is not None:
+                return pd.DatetimeIndex(arrays["minutes"])
+            found = self.cache.load_prefix("_calendar", sources,
+                                           self._cache_params())
+        if found is not None:
+            # The standard CSV only grew, add its new trading days
+            arrays, offsets = found
+            time_index = self.calendar.extend_minutes(
+                pd.DatetimeIndex(arrays["minutes"]), offsets[0],
+                self.data_start_date, self.data_end_date
+            )
+        else:
+            time_index = self.calendar.minutes(self.data_start_date,
+                                               self.data_end_date)
+        if self.cache is not None:
+            self.cache.save("_calendar", sources, self._cache_params(),
+                            {"minutes": time_index.values})
+        return time_index
+
+    def _aligner(self):
+        """
+        Returns the align(df, time_index) function for this handler,
+        wrapped in the bar aggregation when bar_size is not 1.
+        """
+        if self.bar_size == 1:
+            return self._align_bars
+        return functools.partial(
+            _aggregate_bars, align=self._align_bars, bar_size=self.bar_size,
+            session_start=self.calendar.session_start,
+            session_end=self.calendar.session_end
+        )
+    
+    def _symbol_source(self, symbol):
+        """
+        Returns what _load_bars() reads for a symbol: its CSV path.
+        """
+        return os.path.join(self.csv_dir, '%s.csv' % symbol)
+    
+    def _read_symbol_csv(self, symbol, time_index):
+        """
+        Parses the CSV file of a symbol and aligns it to the
+        session grid, returning a BarStore.
+        """
+        return self._load_bars(self._symbol_source(symbol), time_index,
+                               self._aligner())
+    
+    def _read_symbol_csvs(self, symbols, time_index):
+        """
+        Parses and aligns the CSV files of several symbols, on a
+        pool of load_workers threads or processes when more than
+        one worker is configured. The BarStores are returned in the
+        order of symbols.
+        """
+        if self.load_workers <= 1 or len(symbols) <= 1:
+            return [self._read_symbol_csv(s, time_index) for s in symbols]
+        
+        if self.load_pool == "process":
+            pool_cls = concurrent.futures.ProcessPoolExecutor
+        else:
+            pool_cls = concurrent.futures.ThreadPoolExecutor
+        sources = [self._symbol_source(s) for s in symbols]
+        with pool_cls(max_workers=self.load_workers) as pool:
+            return list(pool.map(
+                self._load_bars, sources,
+                [time_index] * len(sources), [self._aligner()] * len(sources)
+            ))
+    
     def _open_convert_csv_files(self):
         """
         Opens the CSV files from the data directory, converting
-        them into pandas DataFrames within a symbol dictionary.
+        them into columnar BarStores within a symbol dictionary.
+        Symbols found up to date in the bar cache are loaded from
+        it instead of being parsed again, and symbols whose CSV file
+        only had rows appended are extended from the new rows.
         
         For this handler it will be assumed that the data is
         taken from Yahoo. Thus its format will be respected.
         """
-        
-        data_start_date = datetime.datetime(2020,12,17,8,46,0) 
-        data_end_date = datetime.datetime(2021,3,31,12,8,0)
-        periods = int((data_end_date - data_start_date).days *24*60 + (data_end_date - data_start_date).seconds / 60)
-        
-        standard_date = [] #只有年月日
-        standard_df = pd.read_csv("TXFF1.csv")   #用來當標準時間的CSV
-        standard_datetime = standard_df["Date"]   #年月日時分秒
-        standard_datetime.index = pd.DatetimeIndex(standard_datetime)  
-        standard_datetime_day = list(standard_datetime.between_time("8:46:0","13:45:0"))  #只取日盤時間
-        standard_datetime = standard_datetime_day
-        standard_datetime.sort()
-        standard_datetime = pd.Series(standard_datetime)
-        for i in range(0,len(standard_datetime)):
-            standard_date.append(standard_datetime[i][0:10])  
-        standard_date = list(set(standard_date)) #避免重複
-        standard_date.sort()
-        start_date_index = standard_date.index(str(data_start_date)[0:10]) #找出起始日在standart_date的index
-        standard_date = standard_date[start_date_index:len(standard_date)]
-  
-        temp = []
-        
-        for i in range(0,periods+1):                         
-            minute = (data_start_date + datetime.timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S")
-            temp.append(minute)
-        
-        #只取日盤時間
-        temp = pd.Series(temp)
-        temp.index = pd.DatetimeIndex(temp)
-        temp_day = list(temp.between_time("8:46:0","13:45:0"))       
-        temp = temp_day
-        temp.sort() 
-        
-        for i in range(len(temp)-1,-1,-1):
-            if temp[i][0:10] not in standard_date:   #如果日期不在標準日期裡面就拿掉 第一層判斷
-                temp.remove(temp[i])  #去掉temp[i]元素
-           
-        time_index = pd.DatetimeIndex(temp)
-      
+        missing = []
         for s in self.symbol_list:
-            # Load the CSV file with no header information, indexed on date
-            self.symbol_data[s] = pd.io.parsers.read_csv(
-                os.path.join(self.csv_dir, '%s.csv' % s),
-                header=0, index_col=0, parse_dates=True,
-                names=[
-                    'datetime', 'open', 'high',
-                    'low', 'close', 'adj_close', 'volume'
-                ]
-            ).sort_index()
-               
-            # Set the latest symbol_data to None
-            self.latest_symbol_data[s] = []
+            if self.cache is not None:
+                arrays = self.cache.load(s, self._cache_sources(s),
+                                         self._cache_params())
+                if arrays is not None:
+                    self.symbol_data[s] = BarStore.from_arrays(arrays)
+                    continue
+            missing.append(s)
+        if not missing:
+            return
         
-        # Reindex the dataframes
+        time_index = self._session_minutes()
+        if self.cache is not None and self._appendable():
+            for s in list(missing):
+                if self._append_symbol_csv(s, time_index):
+                    missing.remove(s)
+            if not missing:
+                return
+        stores = self._read_symbol_csvs(missing, time_index)
+        for s, store in zip(missing, stores):
+            self.symbol_data[s] = store
+            if self.cache is not None:
+                arrays = store.arrays()
+                if self._appendable() and len(time_index) > 0:
+                    last = _read_last_bar(self._symbol_source(s))
+                    arrays.update(self._append_state(last, time_index))
+                self.cache.save(s, self._cache_sources(s),
+                                self._cache_params(), arrays)
+    
+    def _appendable(self):
+        """
+        Whether cached symbols can be extended with the rows
+        appended to their CSV files. Aggregated bars are always
+        rebuilt, as a new minute can change a bar already built.
+        """
+        return self.bar_size == 1 and self._load_bars is _load_bar_csv
+    
+    @staticmethod
+    def _append_state(last, time_index):
+        """
+        Returns the arrays stored with a cached symbol so it can be
+        extended later: the last CSV row and the last grid minute.
+        """
+        return {
+            "csv_last_ts": np.asarray(last.index.values,
+                                      dtype='datetime64[ns]').view(np.int64),
+            "csv_last_bar": last[list(BAR_FIELDS)].to_numpy(dtype=np.float64),
+            "grid_end": np.asarray(time_index.values[-1:],
+                                   dtype='datetime64[ns]').view(np.int64),
+        }
+    
+    def _append_symbol_csv(self, symbol, time_index):
+        """
+        Extends the cached arrays of a symbol whose CSV file and
+        calendar only had rows appended, parsing only the new rows.
+        Everything from the first new row or grid minute on is
+        aligned again; the bars before it cannot have changed. Returns
+        False when a full rebuild is needed instead.
+        """
+        found = self.cache.load_prefix(symbol, self._cache_sources(symbol),
+                                       self._cache_params())
+        if found is None or len(time_index) == 0:
+            return False
+        arrays, offsets = found
+        if "csv_last_ts" not in arrays:
+            return False
+        tail = _read_csv_tail(self._symbol_source(symbol), offsets[0])
+        tail_ts = np.asarray(tail.index.values,
+                             dtype='datetime64[ns]').view(np.int64)
+        if np.any(np.diff(np.r_[arrays["csv_last_ts"], tail_ts]) <= 0):
+            # Rows were inserted out of order
+            return False
+
+        cut = arrays["grid_end"][0] + 1
+        if len(tail_ts) > 0:
+            cut = min(cut, tail_ts[0])
+        cached = BarStore.from_arrays(arrays)
+        keep = np.searchsorted(cached.timestamps, cut)
+        grid = time_index[np.asarray(time_index.values, dtype='datetime64[ns]')
+                          .view(np.int64) >= cut]
+        last = pd.DataFrame(
+            arrays["csv_last_bar"], columns=list(BAR_FIELDS),
+            index=pd.DatetimeIndex(arrays["csv_last_ts"], name='datetime')
+        )
+        rows = pd.concat([last, tail[list(BAR_FIELDS)]]) if len(tail) else last
+        rows.index.name = 'datetime'
+        new = self._align_bars(rows, grid)
+        store = BarStore(
+            np.r_[cached.timestamps[:keep], new.timestamps],
+            np.vstack([cached.matrix[:keep], new.matrix])
+        )
+        self.symbol_data[symbol] = store
+        arrays = store.arrays()
+        arrays.update(self._append_state(rows.iloc[-1:], time_index))
+        self.cache.save(symbol, self._cache_sources(symbol),
+                        self._cache_params(), arrays)
+        return True
+    
+    def _compact_stores(self):
+        """
+        Replaces every BarStore with its CompactBarStore encoding.
+        The cache keeps the float arrays, so it is shared with
+        handlers that do not set tick_size.
+        """
         for s in self.symbol_list:
-            self.symbol_data[s] = self.symbol_data[s].reindex(
-                index=time_index,method="pad").fillna(0).iterrows()
+            self.symbol_data[s] = CompactBarStore.from_store(
+                self.symbol_data[s], self.tick_size
+            )
     
-    def _get_new_bar(self, symbol):
+    def _attach_shared_store(self, shared_store_dir):
         """
-        Returns the latest bar from the data feed.
+        Attaches every symbol to the memory-mapped arrays of a
+        SharedBarStore, without parsing or copying any data.
         """
-        for b in self.symbol_data[symbol]:
-            yield b
+        shared = SharedBarStore(shared_store_dir)
+        for s in self.symbol_list:
+            self.symbol_data[s] = shared.attach(s)
     
-    def get_latest_bar(self, symbol):
+    def _get_store(self, symbol):
         """
-        Returns the last bar from the latest_symbol list.
+        Returns the BarStore of a symbol.
         """
         try:
-            bars_list = self.latest_symbol_data[symbol]
+            return self.symbol_data[symbol]
         except KeyError:
             print("That symbol is not available in the historical data set.")
             raise
-        else:
-            return bars_list[-1]
+    
+    def _latest_index(self, symbol):
+        """
+        Returns the position of the latest bar of a symbol,
+        -1 before the first update.
+        """
+        return self.bar_index
+    
+    def get_latest_bar(self, symbol):
+        """
+        Returns the last bar as a (datetime, Bar) tuple.
+        """
+        store = self._get_store(symbol)
+        i = self._latest_index(symbol)
+        if i < 0:
+            raise IndexError("No bar has been updated yet.")
+        return (store.datetime(i), store.bar(i))
 
     def get_latest_bars(self, symbol, N=1):
         """
-        Returns the last N bars from the latest_symbol list,
+        Returns the last N bars as (datetime, Bar) tuples,
         or N-k if less available.
         """
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            return bars_list[-N:]
+        store = self._get_store(symbol)
+        i = self._latest_index(symbol)
+        start = max(i + 1 - N, 0)
+        return [(store.datetime(k), store.bar(k))
+                for k in range(start, i + 1)]
     
     def get_latest_bar_datetime(self, symbol):
         """
         Returns a Python datetime object for the last bar.
         """
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            return bars_list[-1][0]
+        store = self._get_store(symbol)
+        i = self._latest_index(symbol)
+        if i < 0:
+            raise IndexError("No bar has been updated yet.")
+        return store.datetime(i)
 
     def get_latest_bar_value(self, symbol, val_type):
         """
         Returns one of the Open, High, Low, Close, Volume or OI
-        values from the pandas Bar series object.
+        values from the latest bar.
         """
-        try:
-            bars_list = self.latest_symbol_data[symbol]
-        except KeyError:
-            print("That symbol is not available in the historical data set.")
-            raise
-        else:
-            return getattr(bars_list[-1][1], val_type)
+        store = self._get_store(symbol)
+        i = self._latest_index(symbol)
+        if i < 0:
+            raise IndexError("No bar has been updated yet.")
+        return store.value(val_type, i)
 
     def get_latest_bars_values(self, symbol, val_type, N=1):
         """
-        Returns the last N bar values from the
-        latest_symbol list, or N-k if less available.
+        Returns a read-only view of the last N bar values,
+        or N-k if less available (a new array when tick_size is set).
+        """
+        store = self._get_store(symbol)
+        i = self._latest_index(symbol)
+        start = max(i + 1 - N, 0)
+        return store.values(val_type, start, i + 1)
+
+    def get_latest_bars_fields(self, symbol, N=1, val_types=None):
+        """
+        Returns the last N bars as an (N, fields) array, all of
+        BAR_FIELDS by default. It is a read-only view whenever
+        val_types are adjacent in BAR_FIELDS order.
+        """
+        store = self._get_store(symbol)
+        i = self._latest_index(symbol)
+        start = max(i + 1 - N, 0)
+        return store.values_matrix(start, i + 1, val_types)
+
+    @property
+    def features(self):
+        """
+        The FeatureStore of indicator columns over the bars of this
+        handler, created on first use and persisted in the bar cache
+        when there is one.
+        """
+        if self._features is None:
+            self._features = FeatureStore(self, self.cache)
+        return self._features
+
+    def _field_panel(self, val_type):
+        """
+        Returns a read-only (symbols, bars) array of one field of
+        every symbol in symbol_list, built on first use, or None when
+        the bars are memory-mapped from a SharedBarStore or held as
+        CompactBarStore ticks. All symbols share the session grid, so
+        one column is one bar and the last N bars of every symbol are
+        a single view.
+        """
+        if self._panels is None:
+            return None
+        panel = self._panels.get(val_type)
+        if panel is None:
+            panel = np.empty((len(self.symbol_list),
+                              len(self.symbol_data[self.symbol_list[0]])))
+            for k, s in enumerate(self.symbol_list):
+                store = self.symbol_data[s]
+                panel[k] = store.values(val_type, 0, len(store))
+            panel.flags.writeable = False
+            self._panels[val_type] = panel
+        return panel
+
+    def get_latest_values(self, val_type, symbols=None):
+        """
+        Returns a vector of the latest val_type value of every
+        symbol in symbols (symbol_list by default).
+        """
+        if self.bar_index < 0:
+            raise IndexError("No bar has been updated yet.")
+        if symbols is None:
+            symbols = self.symbol_list
+        return np.array([self._get_store(s).value(val_type, self.bar_index)
+                         for s in symbols], dtype=np.float64)
+
+    def get_latest_values_matrix(self, val_type, N=1, symbols=None):
+        """
+        Returns a (symbols, N) array of the last N val_type values
+        of every symbol in symbols (symbol_list by default), or N-k
+        columns if less available. Without symbols it is a read-only
+        view of the field panel when there is one.
+        """
+        start = max(self.bar_index + 1 - N, 0)
+        stop = self.bar_index + 1
+        panel = self._field_panel(val_type)
+        if panel is not None and symbols is None:
+            return panel[:, start:stop]
+        if symbols is None:
+            symbols = self.symbol_list
+        out = np.empty((len(symbols), stop - start))
+        for k, s in enumerate(symbols):
+            out[k] = self._get_store(s).values(val_type, start, stop)
+        return out
+
+    def _repeat_runs(self):
+        """
+        Returns, for every position on the grid, how many bars in a
+        row up to it repeat the bar before them for every symbol: 0
+        where any symbol's bar changed, k for the k-th repeat. Built
+        on first use.
+        """
+        if self._repeats is None:
+            n = len(self.symbol_data[self.symbol_list[0]])
+            same = np.zeros(n, dtype=bool)
+            same[1:] = True
+            for s in self.symbol_list:
+                m = self.symbol_data[s].values_matrix(0, n)
+                same[1:] &= (m[1:] == m[:-1]).all(axis=1)
+            idx = np.arange(n)
+            last_change = np.maximum.accumulate(np.where(same, 0, idx))
+            self._repeats = idx - last_change
+        return self._repeats
+
+    def unchanged_bars(self, lookback):
+        """
+        Returns how many bars from the next one on repeat the bars
+        before them for every symbol, for at least lookback bars in
+        a row, so the last lookback bars are the same at each.
+        """
+        repeats = self._repeat_runs()
+        n = 0
+        i = self.bar_index + 1
+        if i < len(repeats) and repeats[i] >= lookback:
+            changes = np.flatnonzero(repeats[i:] == 0)
+            n = changes[0] if len(changes) else len(repeats) - i
+        return n
+
+    def skip_bars(self, n):
+        """
+        Moves the bar cursor n bars on without sending MarketEvents
+        and returns the datetimes of those bars.
+        """
+        store = self.symbol_data[self.symbol_list[0]]
+        start = self.bar_index + 1
+        self.bar_index += n
+        return pd.DatetimeIndex(
+            store.timestamps[start:self.bar_index + 1].view('datetime64[ns]')
+        )
+
+    def update_bars(self):
+        """
+        Advances the bar cursor by one, making the next bar the
+        latest one for all symbols in the symbol list.
+        """
+        if self.bar_index + 1 < len(self.symbol_data[self.symbol_list[0]]):
+            self.bar_index += 1
+        else:
+            self.continue_backtest = False
+        self.events.put(MarketEvent.ALL)
+
+
+class MergedCSVDataHandler(HistoricCSVDataHandler):
+    """
+    MergedCSVDataHandler replays the same CSV files as
+    HistoricCSVDataHandler, but without forward-filling every symbol
+    onto the full minute grid.
+    
+    Each symbol keeps only its own bars that fall on the session
+    grid. update_bars() merges the symbols' timestamps with a heap
+    (k-way merge) and advances only the symbols that printed a bar
+    at the next timestamp; their names are carried by the
+    MarketEvent. The getters return the last known bar of every
+    symbol, so quiet back-month contracts cost nothing until they
+    trade again.
+    """
+    
+    _align_bars = staticmethod(_select_bars)
+    
+    def __init__(self, events, csv_dir, symbol_list, **kwargs):
+        """
+        Initialises the merged data handler. Takes the same
+        parameters as HistoricCSVDataHandler.
+        """
+        HistoricCSVDataHandler.__init__(self, events, csv_dir, symbol_list,
+                                        **kwargs)
+        self.bar_index = dict((s, -1) for s in self.symbol_list)
+        self.updated_symbols = []
+        self._heap = []
+        for k, s in enumerate(self.symbol_list):
+            if len(self.symbol_data[s]) > 0:
+                self._heap.append((self.symbol_data[s].timestamps[0], k, s))
+        heapq.heapify(self._heap)
+    
+    def _cache_params(self):
+        """
+        Returns the parameters the cached arrays depend on.
+        """
+        params = HistoricCSVDataHandler._cache_params(self)
+        params["alignment"] = "merge"
+        return params
+    
+    # The symbols do not share a grid, so there is no field panel
+    get_latest_values = DataHandler.get_latest_values
+    get_latest_values_matrix = DataHandler.get_latest_values_matrix
+    unchanged_bars = DataHandler.unchanged_bars
+    skip_bars = DataHandler.skip_bars
+    
+    def _latest_index(self, symbol):
+        """
+        Returns the position of the latest bar of a symbol,
+        -1 before its first bar.
+        """
+        return self.bar_index[symbol]
+    
+    def update_bars(self):
+        """
+        Advances every symbol whose next bar has the earliest
+        timestamp and sends a MarketEvent naming them. Sends nothing
+        once every symbol has run out of bars.
+        """
+        self.updated_symbols = []
+        if not self._heap:
+            self.continue_backtest = False
+            return
+        ts = self._heap[0][0]
+        while self._heap and self._heap[0][0] == ts:
+            _, k, s = heapq.heappop(self._heap)
+            self.bar_index[s] += 1
+            self.updated_symbols.append(s)
+            nxt = self.bar_index[s] + 1
+            if nxt < len(self.symbol_data[s]):
+                heapq.heappush(
+                    self._heap, (self.symbol_data[s].timestamps[nxt], k, s)
+                )
+        self.events.put(MarketEvent(self.updated_symbols))
+
+
+class BufferedDataHandler(DataHandler):
+    """
+    BufferedDataHandler is a base class for data handlers that
+    receive their bars one at a time (streamed files, ticks, live
+    feeds) rather than holding the whole history in memory.
+    
+    The latest bars of each symbol are kept in a fixed-size
+    BarRingBuffer, so memory is bounded by max_lookback no matter
+    how long the run is. Subclasses implement update_bars() and
+    call _push_bar() for every new bar.
+    
+    With a bar_size other than 1 the pushed minute bars are
+    aggregated on the fly by a BarAggregator per symbol, and only
+    completed bars reach the history.
+    """
+    
+    def __init__(self, events, symbol_list, max_lookback=500, bar_size=1,
+                 session_start=datetime.time(8, 46),
+                 session_end=datetime.time(13, 45)):
+        """
+        Initialises the buffers of the handler.
+        
+        Parameters:
+        events - The Event Queue.
+        symbol_list - A list of symbol strings.
+        max_lookback - The most bars get_latest_bars* can return.
+        bar_size - Minutes per bar, or "D" for one bar per session.
+        session_start - First minute of the session, for bar_size.
+        session_end - Last minute of the session, for bar_size.
+        """
+        self.events = events
+        self.symbol_list = symbol_list
+        self.max_lookback = max_lookback
+        self.bar_size = bar_size
+        self.continue_backtest = True
+        
+        self.latest_symbol_data = dict(
+            (s, BarRingBuffer(max_lookback)) for s in self.symbol_list
+        )
+        self.aggregators = {}
+        if bar_size != 1:
+            self.aggregators = dict(
+                (s, BarAggregator(bar_size, session_start, session_end))
+                for s in self.symbol_list
+            )
+    
+    def _push_bar(self, symbol, timestamp, bar):
+        """
+        Appends a bar to the history of a symbol, or feeds it to
+        the symbol's aggregator. Returns True if the history received
+        at least one new bar.
+        
+        Parameters:
+        symbol - The symbol the bar belongs to.
+        timestamp - Epoch nanoseconds of the bar.
+        bar - A sequence of values in BAR_FIELDS order.
+        """
+        if not self.aggregators:
+            self.latest_symbol_data[symbol].append(timestamp, bar)
+            return True
+        completed = self.aggregators[symbol].update(timestamp, bar)
+        for label, values in completed:
+            self.latest_symbol_data[symbol].append(label, values)
+        return len(completed) > 0
+    
+    def _flush_bars(self):
+        """
+        Completes the partly built aggregated bars, e.g. at the end
+        of the data. Returns the symbols whose history got a bar.
+        """
+        updated = []
+        for s in self.symbol_list:
+            if s in self.aggregators:
+                done = self.aggregators[s].flush()
+                if done is not None:
+                    self.latest_symbol_data[s].append(done[0], done[1])
+                    updated.append(s)
+        return updated
+    
+    def _get_buffer(self, symbol):
+        """
+        Returns the BarRingBuffer of a symbol.
         """
         try:
-            bars_list = self.get_latest_bars(symbol, N)
+            return self.latest_symbol_data[symbol]
         except KeyError:
-            print("That symbol is not available in the historical data set.")
+            print("That symbol is not available in the data set.")
             raise
-        else:
-            return np.array([getattr(b[1], val_type) for b in bars_list])
+    
+    def get_latest_bar(self, symbol):
+        """
+        Returns the last bar as a (datetime, Bar) tuple.
+        """
+        buf = self._get_buffer(symbol)
+        return (buf.datetime(buf.count - 1), buf.bar(buf.count - 1))
 
-    def update_bars(self):
+    def get_latest_bars(self, symbol, N=1):
+        """
+        Returns the last N bars as (datetime, Bar) tuples,
+        or N-k if less available.
+        """
+        buf = self._get_buffer(symbol)
+        start = max(buf.count - N, buf.count - len(buf))
+        return [(buf.datetime(i), buf.bar(i))
+                for i in range(start, buf.count)]
+    
+    def get_latest_bar_datetime(self, symbol):
+        """
+        Returns a Python datetime object for the last bar.
+        """
+        buf = self._get_buffer(symbol)
+        return buf.datetime(buf.count - 1)
+
+    def get_latest_bar_value(self, symbol, val_type):
+        """
+        Returns one of the Open, High, Low, Close, Volume or OI
+        values from the latest bar.
+        """
+        buf = self._get_buffer(symbol)
+        return buf.value(val_type, buf.count - 1)
+
+    def get_latest_bars_values(self, symbol, val_type, N=1):
+        """
+        Returns a read-only view of the last N bar values, or N-k
+        if less available. The view is only valid until the next
+        bar is pushed.
+        """
+        buf = self._get_buffer(symbol)
+        return buf.values(val_type, buf.count - N, buf.count)
+
+    def get_latest_bars_fields(self, symbol, N=1, val_types=None):
+        """
+        Returns the last N bars as an (N, fields) array, all of
+        BAR_FIELDS by default. Like get_latest_bars_values() it is a
+        view that is only valid until the next bar is pushed.
+        """
+        buf = self._get_buffer(symbol)
+        return buf.values_matrix(buf.count - N, buf.count, val_types)
+
+
+class StreamingCSVDataHandler(BufferedDataHandler):
+    """
+    StreamingCSVDataHandler replays the same CSV files as
+    HistoricCSVDataHandler without loading them into memory.
+    
+    Each symbol's file is read in chunks of `chunksize` rows and
+    aligned to the session calendar one trading day at a time, with
+    the same forward-fill as the historic handler. Only the unread
+    rows of the current chunk, one aligned day and the last
+    max_lookback bars are resident, so memory stays bounded however
+    long the history is. The files must be sorted by date.
+    """
+    
+    def __init__(self, events, csv_dir, symbol_list,
+                 data_start_date=datetime.datetime(2020,12,17,8,46,0),
+                 data_end_date=datetime.datetime(2021,3,31,12,8,0),
+                 calendar=None, chunksize=10000, max_lookback=500):
         """
-        Pushes the latest bar to the latest_symbol_data structure
-        for all symbols in the symbol list.
+        Initialises the streaming data handler.
+        
+        Parameters:
+        events - The Event Queue.
+        csv_dir - Absolute directory path to the CSV files.
+        symbol_list - A list of symbol strings.
+        data_start_date - First minute of the session grid.
+        data_end_date - Last minute of the session grid.
+        calendar - An optional SessionCalendar, built from
+        TXFF1.csv if not given.
+        chunksize - Number of CSV rows parsed at a time.
+        max_lookback - The most bars get_latest_bars* can return.
         """
+        BufferedDataHandler.__init__(self, events, symbol_list, max_lookback)
+        self.csv_dir = csv_dir
+        self.data_start_date = data_start_date
+        self.data_end_date = data_end_date
+        self.calendar = calendar if calendar is not None else SessionCalendar()
+        self.chunksize = chunksize
+        
+        self._days = self.calendar.iter_day_minutes(self.data_start_date,
+                                                    self.data_end_date)
+        self._readers = {}
+        self._pending_ts = {}    # parsed rows not aligned yet
+        self._pending = {}
+        self._carry = {}         # last row before the pending ones
         for s in self.symbol_list:
+            self._readers[s] = pd.read_csv(
+                os.path.join(self.csv_dir, '%s.csv' % s),
+                header=0, index_col=0, parse_dates=True,
+                names=[
+                    'datetime', 'open', 'high',
+                    'low', 'close', 'adj_close', 'volume'
+                ],
+                chunksize=self.chunksize
+            )
+            self._pending_ts[s] = np.empty(0, dtype=np.int64)
+            self._pending[s] = np.empty((0, len(BAR_FIELDS)), dtype=np.float64)
+            self._carry[s] = np.zeros(len(BAR_FIELDS), dtype=np.float64)
+        
+        self._block_ts = np.empty(0, dtype=np.int64)
+        self._blocks = {}
+        self._block_pos = 0
+    
+    def _drop_before(self, symbol, start_ns):
+        """
+        Drops the pending rows of a symbol before start_ns, keeping
+        the last of them as the carry.
+        """
+        k = np.searchsorted(self._pending_ts[symbol], start_ns, side='left')
+        if k:
+            self._carry[symbol] = self._pending[symbol][k - 1]
+            self._pending_ts[symbol] = self._pending_ts[symbol][k:]
+            self._pending[symbol] = self._pending[symbol][k:]
+    
+    def _read_until(self, symbol, start_ns, end_ns):
+        """
+        Parses chunks of a symbol's file until its pending rows
+        reach past end_ns or the file is exhausted. Rows before
+        start_ns are dropped as they are read, only the last one is
+        kept as the carry, so a long history before the grid costs
+        no memory.
+        """
+        reader = self._readers[symbol]
+        while reader is not None and (
+            len(self._pending_ts[symbol]) == 0 or
+            self._pending_ts[symbol][-1] <= end_ns
+        ):
             try:
-                bar = next(self._get_new_bar(s))
+                chunk = next(reader)
             except StopIteration:
-                self.continue_backtest = False
-            else:
-                if bar is not None:
-                    self.latest_symbol_data[s].append(bar)
-        self.events.put(MarketEvent())
+                reader.close()
+                reader = self._readers[symbol] = None
+                break
+            ts = np.asarray(chunk.index.values,
+                            dtype='datetime64[ns]').view(np.int64)
+            if np.any(np.diff(ts) < 0) or (
+                len(self._pending_ts[symbol]) > 0 and len(ts) > 0 and
+                ts[0] < self._pending_ts[symbol][-1]
+            ):
+                raise ValueError("%s.csv is not sorted by date" % symbol)
+            self._pending_ts[symbol] = np.concatenate(
+                [self._pending_ts[symbol], ts])
+            self._pending[symbol] = np.concatenate(
+                [self._pending[symbol],
+                 chunk[list(BAR_FIELDS)].to_numpy(dtype=np.float64)])
+            self._drop_before(symbol, start_ns)
+    
+    def _align_block(self, symbol, grid):
+        """
+        Returns the bars of a symbol forward-filled onto the int64
+        timestamps of grid, consuming the pending rows up to its end.
+        """
+        self._drop_before(symbol, grid[0])
+        self._read_until(symbol, grid[0], grid[-1])
+        ts = self._pending_ts[symbol]
+        used = np.searchsorted(ts, grid[-1], side='right')
+        rows = np.vstack([self._carry[symbol], self._pending[symbol][:used]])
+        idx = np.searchsorted(ts[:used], grid, side='right')
+        block = rows[idx]
+        block[np.isnan(block)] = 0.0
+        
+        self._carry[symbol] = rows[-1]
+        self._pending_ts[symbol] = ts[used:]
+        self._pending[symbol] = self._pending[symbol][used:]
+        return block
+    
+    def _next_block(self):
+        """
+        Aligns the next trading day for every symbol. Returns False
+        once the calendar is exhausted.
+        """
+        try:
+            minutes = next(self._days)
+        except StopIteration:
+            return False
+        self._block_ts = np.asarray(minutes.values,
+                                    dtype='datetime64[ns]').view(np.int64)
+        for s in self.symbol_list:
+            self._blocks[s] = self._align_block(s, self._block_ts)
+        self._block_pos = 0
+        return True
+    
+    def update_bars(self):
+        """
+        Pushes the next session minute to the latest_symbol_data
+        structure for all symbols in the symbol list.
+        """
+        if self._block_pos >= len(self._block_ts) and not self._next_block():
+            self.continue_backtest = False
+        else:
+            i = self._block_pos
+            for s in self.symbol_list:
+                self._push_bar(s, self._block_ts[i], self._blocks[s][i])
+            self._block_pos += 1
+        self.events.put(MarketEvent.ALL)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:52:17 2026
+"""
+
+###event dispatch
+class EventDispatcher(object):
+    """
+    EventDispatcher routes each event to the handlers subscribed to
+    its class or to any of its base classes, so subscribing to Event
+    receives everything (e.g. a logger) and several components can
+    share one event type (e.g. a risk manager next to the portfolio).
+
+    The handler list of every event class is resolved once and kept
+    in a table, so dispatching is one dict lookup plus the calls.
+    Handlers run in the order they subscribed.
+    """
+
+    def __init__(self):
+        self._subscriptions = []  # (event class, handler) in order
+        self._table = {}          # event class to tuple of handlers
+
+    def subscribe(self, event_cls, handler):
+        """
+        Calls handler(event) for every event that is an instance of
+        event_cls, after the handlers subscribed before it.
+        """
+        self._subscriptions.append((event_cls, handler))
+        self._table.clear()
+
+    def unsubscribe(self, event_cls, handler):
+        """
+        Removes a subscription made with subscribe().
+        """
+        self._subscriptions.remove((event_cls, handler))
+        self._table.clear()
+
+    def handlers(self, event_cls):
+        """
+        Returns the handlers events of event_cls are passed to.
+        """
+        handlers = self._table.get(event_cls)
+        if handlers is None:
+            handlers = tuple(h for c, h in self._subscriptions
+                             if issubclass(event_cls, c))
+            self._table[event_cls] = handlers
+        return handlers
+
+    def dispatch(self, event):
+        """
+        Passes an event to each of its handlers in turn.
+        """
+        handlers = self._table.get(event.__class__)
+        if handlers is None:
+            handlers = self.handlers(event.__class__)
+        for handler in handlers:
+            handler(event)
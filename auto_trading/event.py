@@ -13,25 +13,88 @@ class Event(object):
     Event is base class providing an interface for all subsequent
     (inherited) events, that will trigger further events in the
     trading infrastructure.
+
+    Events declare __slots__ and keep their type as a class
+    attribute, so an event is a small fixed-size object without a
+    __dict__. They still pickle and copy as usual.
+    """
+    __slots__ = ()
+
+
+class PooledEvent(Event):
+    """
+    PooledEvent is the base class of the events a backtest recycles
+    (orders and fills). Components create them with create() instead
+    of the constructor; it re-initialises an event from the class
+    pool if one is free and allocates one otherwise.
+
+    Only the event loop puts events back, with release(), once every
+    handler has seen them and only if no handler outside the engine
+    could hold on to them (see Backtest). Without releases, e.g. in
+    live trading, create() is the same as the constructor.
     """
-    pass
+    __slots__ = ()
+    POOL_SIZE = 256
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._pool = []
+
+    @classmethod
+    def create(cls, *args, **kwargs):
+        """
+        Returns an initialised event, recycled if possible.
+        """
+        pool = cls._pool
+        if pool:
+            event = pool.pop()
+            event.__init__(*args, **kwargs)
+            return event
+        return cls(*args, **kwargs)
+
+    def release(self):
+        """
+        Returns the event to its class pool. It must not be used
+        afterwards.
+        """
+        pool = self.__class__._pool
+        if len(pool) < self.POOL_SIZE:
+            pool.append(self)
 
 class MarketEvent(Event):
     """
     Handles the event of receiving a new market update with
     corresponding bars.
+
+    MarketEvent.ALL is a shared instance for updates of every
+    symbol, so handlers do not allocate an event per bar. Market
+    events are never changed once created, which keeps sharing one
+    safe.
     """
-    def __init__(self):
+    __slots__ = ('symbols',)
+    type = 'MARKET'
+
+    def __init__(self, symbols=None):
         """
         Initialises the MarketEvent.
+        
+        Parameters:
+            symbols - The symbols that received a new bar, or None
+            if every symbol in the symbol list did.
         """
-        self.type = 'MARKET'
+        self.symbols = symbols
+
+MarketEvent.ALL = MarketEvent()
 
 class SignalEvent(Event):
     """
     Handles the event of sending a Signal from a Strategy object.
     This is received by a Portfolio object and acted upon.
     """
+    __slots__ = ('strategy_id', 'symbol', 'datetime', 'signal_type',
+                 'strength')
+    type = "SIGNAL"
+
     def __init__(self, strategy_id, symbol, datetime, signal_type, strength):
         """
         Initialises the SignalEvent.
@@ -44,19 +107,21 @@ class SignalEvent(Event):
             strength - An adjustment factor "suggestion" used to scale
             quantity at the portfolio level. Useful for pairs strategies.       
         """
-        self.type = "SIGNAL"
         self.strategy_id = strategy_id
         self.symbol = symbol
         self.datetime = datetime
         self.signal_type = signal_type
         self.strength = strength
     
-class OrderEvent(Event): 
+class OrderEvent(PooledEvent): 
     """
     Handles the event of sending an Order to an execution system.
     The order contains a symbol (e.g. GOOG), a type (market or limit),
     quantity and a direction.
     """
+    __slots__ = ('symbol', 'order_type', 'quantity', 'direction')
+    type = "ORDER"
+
     def __init__(self, symbol, order_type, quantity, direction):
         """
         Initialises the order type, setting whether it is
@@ -69,7 +134,6 @@ class OrderEvent(Event):
             quantity - Non-negative integer for quantity.
             direction - ’BUY’ or ’SELL’ for long or short.
         """
-        self.type = "ORDER"
         self.symbol = symbol
         self.order_type = order_type
         self.quantity = quantity
@@ -84,13 +148,17 @@ class OrderEvent(Event):
             (self.symbol, self.order_type, self.quantity, self.direction)
             )
     
-class FillEvent(Event):
+class FillEvent(PooledEvent):
     """
     Encapsulates the notion of a Filled Order, as returned
     from a brokerage. Stores the quantity of an instrument
     actually filled and at what price. In addition, stores
     the commission of the trade from the brokerage.
     """
+    __slots__ = ('timeindex', 'symbol', 'exchange', 'quantity',
+                 'direction', 'fill_cost', 'commission')
+    type = 'FILL'
+
     def __init__(self, timeindex, symbol, exchange, quantity,
                  direction, fill_cost, commission=None):
         """
@@ -111,7 +179,6 @@ class FillEvent(Event):
         commission - An optional commission sent from IB.
         """
         
-        self.type = 'FILL'
         self.timeindex = timeindex
         self.symbol = symbol
         self.exchange = exchange
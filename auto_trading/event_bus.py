@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:20:44 2026
+"""
+from abc import ABCMeta, abstractmethod
+import collections
+import queue
+
+###event bus
+class EventBus(object):
+    """
+    EventBus is an abstract base class for the FIFO queue of events
+    shared by the data handler, strategy, portfolio and execution
+    handler.
+
+    Components only ever call put(); the event loop drains the bus
+    with get(), which returns None once it is empty instead of
+    raising, so no exception is paid for on every bar. Putting None
+    (e.g. when the portfolio generates no order) does nothing.
+    """
+
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def put(self, event):
+        """
+        Adds an event at the back of the bus.
+        """
+        raise NotImplementedError("Should implement put()")
+
+    @abstractmethod
+    def get(self):
+        """
+        Removes and returns the event at the front of the bus, or
+        None if it is empty.
+        """
+        raise NotImplementedError("Should implement get()")
+
+    @abstractmethod
+    def __len__(self):
+        raise NotImplementedError("Should implement __len__()")
+
+    def empty(self):
+        return len(self) == 0
+
+
+class DequeEventBus(EventBus):
+    """
+    DequeEventBus is the event bus of a single-threaded backtest: a
+    plain collections.deque, without the lock and condition variable
+    queue.Queue takes on every call.
+    """
+
+    def __init__(self):
+        self._events = collections.deque()
+
+    def put(self, event):
+        if event is not None:
+            self._events.append(event)
+
+    def get(self):
+        events = self._events
+        return events.popleft() if events else None
+
+    def __len__(self):
+        return len(self._events)
+
+
+class ThreadSafeEventBus(EventBus):
+    """
+    ThreadSafeEventBus wraps a queue.Queue for live trading, where
+    events may be put from feed or broker threads.
+    """
+
+    def __init__(self):
+        self._events = queue.Queue()
+
+    def put(self, event):
+        if event is not None:
+            self._events.put(event)
+
+    def get(self):
+        try:
+            return self._events.get(False)
+        except queue.Empty:
+            return None
+
+    def __len__(self):
+        return self._events.qsize()
@@ -58,7 +58,7 @@ class SimulatedExecutionHandler(ExecutionHandler):
         event - Contains an Event object with order information.
         """
         if event.type == "ORDER":
-            fill_event = FillEvent(
+            fill_event = FillEvent.create(
             datetime.datetime.utcnow(), event.symbol,
             "ARCA", event.quantity, event.direction, None
             )
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:12:37 2026
+"""
+import zlib
+
+import numpy as np
+import pandas as pd
+
+###feature store
+def _sma(field_values, field, window):
+    """
+    Indicators take field_values(name), which returns the whole
+    float64 array of a field, so they can read several fields.
+
+    Simple moving average of the last window values, or of all of
+    them while fewer are available.
+    """
+    return pd.Series(field_values(field)).rolling(window, min_periods=1).mean()
+
+
+def _ema(field_values, field, window):
+    """
+    Exponential moving average with span window, seeded with the
+    first value.
+    """
+    return pd.Series(field_values(field)).ewm(span=window, adjust=False).mean()
+
+
+def _rolling_std(field_values, field, window):
+    """
+    Population standard deviation (like np.std) of the last window
+    values, or of all of them while fewer are available.
+    """
+    return pd.Series(field_values(field)).rolling(window, min_periods=1).std(ddof=0)
+
+
+def _atr(field_values, field, window):
+    """
+    Average true range with Wilder's smoothing. field is not used,
+    the true range comes from high, low and close.
+    """
+    high, low, close = [field_values(f) for f in ('high', 'low', 'close')]
+    prev_close = np.r_[close[:1], close[:-1]]
+    true_range = np.maximum(high, prev_close) - np.minimum(low, prev_close)
+    return pd.Series(true_range).ewm(alpha=1.0 / window, adjust=False).mean()
+
+
+class FeatureStore(object):
+    """
+    FeatureStore computes indicator columns over the whole bar
+    series of a historic data handler, once, with vectorised
+    rolling and exponential window operations.
+
+    A column is memoized by (symbol, indicator, window, field) and,
+    when the handler has a bar cache, persisted next to the bars, so
+    a parameter sweep computes each column once across runs. Every
+    value only depends on the bars up to its own, and reads are
+    taken as-of the handler's latest bar, so there is no lookahead.
+    """
+
+    INDICATORS = {
+        "sma": _sma,
+        "ema": _ema,
+        "std": _rolling_std,
+        "atr": _atr,
+    }
+
+    def __init__(self, bars, cache=None):
+        """
+        Initialises an empty feature store.
+
+        Parameters:
+        bars - A data handler holding whole BarStores, such as
+        HistoricCSVDataHandler.
+        cache - Optional BarCache to persist the columns in.
+        """
+        self.bars = bars
+        self.cache = cache
+        self._columns = {}
+
+    def column(self, symbol, indicator, window, field="adj_close"):
+        """
+        Returns the read-only indicator column of a symbol, one
+        value per bar of its BarStore.
+
+        Parameters:
+        symbol - The symbol.
+        indicator - One of "sma", "ema", "std" and "atr".
+        window - Window length in bars.
+        field - The field the indicator is computed over.
+        """
+        key = (symbol, indicator, window, field)
+        values = self._columns.get(key)
+        if values is None:
+            values = self._load_column(symbol, indicator, window, field)
+            values.flags.writeable = False
+            self._columns[key] = values
+        return values
+
+    def _load_column(self, symbol, indicator, window, field):
+        """
+        Returns a column from the cache, computing and storing it on
+        a miss. The cache entry is keyed on a CRC-32 of the bars it
+        was computed from.
+        """
+        if indicator not in self.INDICATORS:
+            raise ValueError("Unknown indicator %s" % indicator)
+        store = self.bars._get_store(symbol)
+        inputs = {}
+
+        def field_values(f):
+            if f not in inputs:
+                inputs[f] = np.ascontiguousarray(
+                    store.values(f, 0, len(store)), dtype=np.float64
+                )
+            return inputs[f]
+
+        name = "_feature_%s_%s_%s_%s" % (symbol, indicator, window, field)
+        params = {"indicator": indicator, "window": window, "field": field}
+        if self.cache is not None:
+            params["bars"] = self._fingerprint(indicator, field_values, field)
+            arrays = self.cache.load(name, [], params)
+            if arrays is not None:
+                return arrays["values"]
+        values = self.INDICATORS[indicator](field_values, field, window) \
+            .to_numpy(dtype=np.float64)
+        if self.cache is not None:
+            self.cache.save(name, [], params, {"values": values})
+        return values
+
+    @staticmethod
+    def _fingerprint(indicator, field_values, field):
+        """
+        Returns a CRC-32 of the input fields of an indicator.
+        """
+        fields = ('high', 'low', 'close') if indicator == "atr" else (field,)
+        crc = 0
+        for f in fields:
+            crc = zlib.crc32(field_values(f).tobytes(), crc)
+        return crc
+
+    def get_latest_value(self, symbol, indicator, window, field="adj_close"):
+        """
+        Returns the indicator value as of the latest bar of a symbol.
+        """
+        i = self.bars._latest_index(symbol)
+        if i < 0:
+            raise IndexError("No bar has been updated yet.")
+        return self.column(symbol, indicator, window, field)[i]
+
+    def get_latest_values(self, symbol, indicator, window, field="adj_close",
+                          N=1):
+        """
+        Returns a read-only view of the last N indicator values as
+        of the latest bar of a symbol, or N-k if less available.
+        """
+        i = self.bars._latest_index(symbol)
+        start = max(i + 1 - N, 0)
+        return self.column(symbol, indicator, window, field)[start:i + 1]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:31:05 2026
+"""
+import numpy as np
+
+###fees
+def ib_commission(symbol, price, quantity):
+    """
+    Interactive Brokers fee for API directed orders, in USD, as in
+    FillEvent.calculate_ib_commission(). price is not used. quantity
+    may be a number or an array of fills.
+    """
+    quantity = np.asarray(quantity)
+    return np.maximum(1.3, np.where(quantity <= 500, 0.013 * quantity,
+                                    0.008 * quantity))
+
+
+# (symbol prefixes, fee per fill, contract multiplier, tax rate)
+TAIFEX_FEES = (
+    (("TXF",), 100.0, 200.0, 0.00002),
+    (("MX", "MTX"), 50.0, 50.0, 0.00002),
+    (("TXO",), 50.0, 50.0, 0.001),
+    (("PUF", "QFF"), 50.0, 100.0, 0.00002),
+)
+TAIFEX_DEFAULT_FEE = (50.0, 2000.0, 0.00002)
+
+def taifex_trade_fee(symbol, price, quantity):
+    """
+    TAIFEX trading cost in TWD: a broker fee per fill plus the
+    futures transaction tax on the contract value, price times
+    quantity times the contract multiplier. price and quantity may
+    be numbers or arrays of fills.
+    """
+    fee, multiplier, tax_rate = TAIFEX_DEFAULT_FEE
+    for prefixes, fee_, multiplier_, tax_rate_ in TAIFEX_FEES:
+        if symbol.startswith(prefixes):
+            fee, multiplier, tax_rate = fee_, multiplier_, tax_rate_
+            break
+    return fee + np.asarray(price) * quantity * multiplier * tax_rate
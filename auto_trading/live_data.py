@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:41:08 2026
+"""
+import asyncio
+import collections
+import datetime
+import os, os.path
+import threading
+import time
+
+import numpy as np
+
+from bar_store import BAR_FIELDS
+from data import BufferedDataHandler, _read_bar_csv
+from event import MarketEvent
+from bar_aggregation import DAY_NS, _time_ns
+from tick_data import TickBarBuilder, TickDataHandler
+
+###live data
+def format_bar(timestamp, symbol, bar):
+    """
+    Returns the feed message of a bar: "bar,<epoch ns>,<symbol>,"
+    followed by its values in BAR_FIELDS order.
+    """
+    return "bar,%d,%s,%s\n" % (timestamp, symbol,
+                               ",".join(repr(float(v)) for v in bar))
+
+
+def format_tick(timestamp, symbol, price, volume):
+    """
+    Returns the feed message of a tick:
+    "tick,<epoch ns>,<symbol>,<price>,<volume>".
+    """
+    return "tick,%d,%s,%r,%r\n" % (timestamp, symbol, float(price),
+                                   float(volume))
+
+
+def parse_message(line):
+    """
+    Parses a feed message into a (kind, timestamp, symbol, values)
+    tuple, values being the bar in BAR_FIELDS order for "bar" and
+    (price, volume) for "tick".
+    """
+    parts = line.decode().rstrip("\r\n").split(",")
+    values = tuple(float(v) for v in parts[3:])
+    if parts[0] == "bar" and len(values) != len(BAR_FIELDS) or \
+            parts[0] == "tick" and len(values) != 2 or \
+            parts[0] not in ("bar", "tick"):
+        raise ValueError("Malformed feed message %r" % line)
+    return parts[0], int(parts[1]), parts[2], values
+
+
+def bar_messages(csv_dir, symbol_list, start_date=None, end_date=None):
+    """
+    Returns the bars of the CSV files of symbol_list as feed
+    messages in time order, e.g. for a LocalFeedServer.
+    """
+    messages = []
+    for k, s in enumerate(symbol_list):
+        df = _read_bar_csv(os.path.join(csv_dir, '%s.csv' % s))
+        df = df.loc[start_date:end_date]
+        ts = np.asarray(df.index.values, dtype='datetime64[ns]').view(np.int64)
+        for t, bar in zip(ts.tolist(), df[list(BAR_FIELDS)].values.tolist()):
+            messages.append((t, k, format_bar(t, s, bar)))
+    messages.sort()
+    return [m for _, _, m in messages]
+
+
+class LocalFeedServer(object):
+    """
+    LocalFeedServer is a stand-in for a market data server: it
+    sends a list of feed messages to every client that connects,
+    over TCP or a Unix socket, from an event loop in a background
+    thread.
+
+    Writes wait for the socket to drain, so a client that stops
+    reading holds the server back just like a real feed would be.
+    """
+
+    def __init__(self, messages, path=None, host="127.0.0.1", port=0,
+                 interval=0.0):
+        """
+        Initialises the server.
+
+        Parameters:
+        messages - The feed messages to send, as strings.
+        path - Unix socket path; TCP on host and port if None.
+        host - TCP host.
+        port - TCP port, 0 for any free port.
+        interval - Seconds to wait between messages.
+        """
+        self.messages = messages
+        self.path = path
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.sent = 0
+        self.address = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = None
+        self._server = None
+
+    def start(self):
+        """
+        Starts serving and returns the address to connect to: the
+        socket path, or a (host, port) tuple.
+        """
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._listen(), self._loop).result()
+        return self.address
+
+    async def _listen(self):
+        if self.path is not None:
+            self._server = await asyncio.start_unix_server(self._serve,
+                                                           self.path)
+            self.address = self.path
+        else:
+            self._server = await asyncio.start_server(self._serve, self.host,
+                                                      self.port)
+            self.address = self._server.sockets[0].getsockname()[:2]
+
+    async def _serve(self, reader, writer):
+        try:
+            for message in self.messages:
+                writer.write(message.encode())
+                await writer.drain()
+                self.sent += 1
+                if self.interval:
+                    await asyncio.sleep(self.interval)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def stop(self):
+        """
+        Stops the server and its thread.
+        """
+        async def shutdown():
+            self._server.close()
+            await self._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class LiveDataHandler(BufferedDataHandler):
+    """
+    LiveDataHandler receives bar or tick messages from a socket
+    feed and serves them through the same interface as the historic
+    handlers.
+
+    An asyncio loop in a background thread reads the socket into a
+    bounded queue of max_pending messages. When the queue is full
+    the reader stops reading, so the socket's flow control pushes
+    back on the server instead of memory growing. update_bars(),
+    called from the engine thread, applies the queued messages up
+    to the next bar timestamp, adding the bars (or the minute bars
+    built from ticks) to the ring buffers, and sends a MarketEvent
+    naming the symbols with a bar at that timestamp. Like with the
+    historic handlers, the strategy sees every bar.
+
+    With conflate, update_bars() instead applies every queued
+    message and sends a single MarketEvent for them all, so a slow
+    strategy sees larger batches, skipping bars, rather than
+    falling behind the feed.
+
+    The time from a message's arrival to the MarketEvent that
+    publishes it is recorded in `latencies` (nanoseconds); see
+    latency_stats().
+    """
+
+    def __init__(self, events, address, symbol_list, max_lookback=500,
+                 bar_size=1, max_pending=10000, poll_timeout=1.0,
+                 latency_window=100000, conflate=False,
+                 session_start=datetime.time(8, 46),
+                 session_end=datetime.time(13, 45)):
+        """
+        Initialises the live data handler and connects to the feed.
+
+        Parameters:
+        events - The Event Queue.
+        address - A (host, port) tuple for TCP or a Unix socket path.
+        symbol_list - A list of symbol strings; messages of other
+        symbols, and bars outside the session, are ignored.
+        max_lookback - The most bars get_latest_bars* can return.
+        bar_size - Minutes per bar, or "D" for one bar per session.
+        max_pending - Messages buffered before reading pauses.
+        poll_timeout - Seconds update_bars() waits for a message.
+        latency_window - Number of latencies kept.
+        conflate - Send one MarketEvent for everything received
+        since the last update_bars() instead of one per timestamp.
+        session_start - First minute bar of the session.
+        session_end - Last minute bar of the session.
+        """
+        BufferedDataHandler.__init__(self, events, symbol_list, max_lookback,
+                                     bar_size, session_start, session_end)
+        self.address = address
+        self.max_pending = max_pending
+        self.poll_timeout = poll_timeout
+        self.conflate = conflate
+        self.builders = dict((s, TickBarBuilder()) for s in self.symbol_list)
+        self.updated_symbols = []
+        self.latencies = collections.deque(maxlen=latency_window)
+        self._first = _time_ns(session_start)
+        self._last = _time_ns(session_end)
+        self._open_label = None  # minute currently built from ticks
+        self._unpublished = []   # arrival times not yet in an event
+        self._pending = collections.deque()  # parsed, not yet applied
+        self._closed = False
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._connect(), self._loop).result()
+
+    # Ticks close minute bars exactly like the recorded tick handler
+    _close_minute = TickDataHandler._close_minute
+
+    async def _connect(self):
+        if isinstance(self.address, str):
+            reader, self._writer = await asyncio.open_unix_connection(
+                self.address
+            )
+        else:
+            reader, self._writer = await asyncio.open_connection(
+                *self.address
+            )
+        self._inbox = asyncio.Queue(self.max_pending)
+        self._reader_task = self._loop.create_task(self._read_feed(reader))
+
+    async def _read_feed(self, reader):
+        """
+        Queues every message with its arrival time, then None once
+        the feed is closed.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await self._inbox.put((time.perf_counter_ns(), line))
+        except ConnectionError:
+            pass
+        await self._inbox.put(None)
+
+    async def _next_batch(self, wait=True):
+        """
+        Returns every queued message, waiting up to poll_timeout
+        for the first one unless wait is False.
+        """
+        batch = []
+        if wait:
+            try:
+                batch = [await asyncio.wait_for(self._inbox.get(),
+                                                self.poll_timeout)]
+            except asyncio.TimeoutError:
+                return []
+        while not self._inbox.empty():
+            batch.append(self._inbox.get_nowait())
+        return batch
+
+    def _handle_message(self, message):
+        """
+        Applies one parsed feed message. Returns the symbols whose
+        history got a new bar.
+        """
+        kind, ts, symbol, values = message
+        if symbol not in self.builders:
+            return []
+        # Like the historic handlers, only session minutes are kept
+        label = ts if kind == "bar" else TickBarBuilder.minute_label(ts)
+        if not self._first <= label % DAY_NS <= self._last:
+            return []
+        if kind == "bar":
+            return [symbol] if self._push_bar(symbol, ts, values) else []
+        updated = []
+        if self._open_label is not None and ts > self._open_label:
+            updated = self._close_minute()
+        self.builders[symbol].update(ts, values[0], values[1])
+        self._open_label = self.builders[symbol].label
+        return updated
+
+    def _receive(self, wait):
+        """
+        Moves the queued messages, parsed, to the pending ones.
+        Returns how many there were.
+        """
+        batch = asyncio.run_coroutine_threadsafe(self._next_batch(wait),
+                                                 self._loop).result()
+        self._pending.extend((item[0], parse_message(item[1]))
+                             if item is not None else None for item in batch)
+        return len(batch)
+
+    def update_bars(self):
+        """
+        Applies the messages received up to the next bar timestamp
+        and sends a MarketEvent naming the symbols with a new bar at
+        it; with conflate, applies every message received and sends
+        one MarketEvent for them all. Waits up to poll_timeout when
+        nothing has arrived; sends nothing if nothing changed.
+        """
+        self.updated_symbols = []
+        if self._closed and not self._pending:
+            self.continue_backtest = False
+            self.close()
+            return
+        if not self._pending and not self._closed:
+            self._receive(wait=True)
+        updated = set()
+        published = None  # timestamp of the message that made a bar
+        # Once a bar is made, messages already queued may still add
+        # bars of other symbols at its timestamp
+        while self._pending or updated and not self.conflate and \
+                not self._closed and self._receive(wait=False):
+            item = self._pending[0]
+            if item is None:
+                if updated:
+                    break
+                self._pending.popleft()
+                self._closed = True
+                updated.update(self._close_minute() + self._flush_bars())
+                break
+            arrived, message = item
+            # Bars of other symbols at the same timestamp go together
+            if updated and not self.conflate and message[1] != published:
+                break
+            self._pending.popleft()
+            self._unpublished.append(arrived)
+            new = self._handle_message(message)
+            if new and published is None:
+                published = message[1]
+            updated.update(new)
+        if not updated:
+            if self._closed:
+                self.continue_backtest = False
+                self.close()
+            return
+        self.updated_symbols = [s for s in self.symbol_list if s in updated]
+        self.events.put(MarketEvent(self.updated_symbols))
+        now = time.perf_counter_ns()
+        self.latencies.extend(now - t for t in self._unpublished)
+        self._unpublished = []
+
+    def latency_stats(self):
+        """
+        Returns the count, mean, median, 99th percentile and maximum
+        of the recorded message-to-event latencies, in microseconds.
+        """
+        if not self.latencies:
+            return {"count": 0}
+        lat = np.fromiter(self.latencies, dtype=np.float64) / 1e3
+        return {
+            "count": len(lat),
+            "mean_us": lat.mean(),
+            "p50_us": np.percentile(lat, 50),
+            "p99_us": np.percentile(lat, 99),
+            "max_us": lat.max(),
+        }
+
+    def close(self):
+        """
+        Disconnects from the feed and stops the background loop.
+        """
+        if self._loop.is_closed():
+            return
+        async def shutdown():
+            self._reader_task.cancel()
+            self._writer.close()
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
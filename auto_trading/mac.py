@@ -6,7 +6,7 @@ Created on Sat Mar 27 11:43:14 2021
 """
 import datetime
 import numpy as np
-from strategy import Strategy
+from strategy import Strategy, SIGNAL_CODES
 from event import SignalEvent
 
 
@@ -28,17 +28,53 @@ class MovingAverageCrossStrategy(Strategy):
             bought[s] = 'OUT'
         return bought
 
+    def calculate_signals_vectorized(self, steps):
+        """
+        calculate_signals() for every step at once, from the SMA
+        columns of the feature store. Only the first bar of a symbol
+        can go LONG (when it is OUT and the short SMA is above the
+        long one); every other bar signals SHORT.
+        """
+        features = self.bars.features
+        signals = np.zeros((len(self.symbol_list), len(steps)), dtype=np.int8)
+        seen = steps >= 0
+        if not seen.any():
+            return signals
+        first = np.argmax(seen)
+        for k, s in enumerate(self.symbol_list):
+            short_sma = features.column(s, "sma", self.short_window)
+            long_sma = features.column(s, "sma", self.long_window)
+            signals[k, seen] = SIGNAL_CODES["SHORT"]
+            if self.bought[s] == "OUT" and \
+                    short_sma[steps[first]] > long_sma[steps[first]]:
+                signals[k, first] = SIGNAL_CODES["LONG"]
+            self.bought[s] = "LONG" \
+                if signals[k, -1] == SIGNAL_CODES["LONG"] else "SHORT"
+        return signals
+
     def calculate_signals(self, event):
         if event.type == 'MARKET':
-            for s in self.symbol_list:
+            symbols = self.symbol_list if event.symbols is None else event.symbols
+            # Precomputed SMA columns when the data handler has them
+            features = getattr(self.bars, "features", None)
+            for s in symbols:
                 bars = self.bars.get_latest_bars_values(
                     s, "adj_close", N=self.long_window
                 )
                 bar_date = self.bars.get_latest_bar_datetime(s)
                 
-                if bars.size > 0:
+                if bars.size > 0 and features is not None:
+                    short_sma = features.get_latest_value(
+                        s, "sma", self.short_window
+                    )
+                    long_sma = features.get_latest_value(
+                        s, "sma", self.long_window
+                    )
+                elif bars.size > 0:
                     short_sma = np.mean(bars[-self.short_window:])
                     long_sma = np.mean(bars[-self.long_window:])
+                
+                if bars.size > 0:
                     symbol = s
                     dt = datetime.datetime.utcnow()
                     sig_dir = ""
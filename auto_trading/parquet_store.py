@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:05:54 2026
+"""
+import os, os.path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # the Parquet store is optional
+    pa = pq = None
+
+from bar_store import BAR_FIELDS
+from data import HistoricCSVDataHandler, _read_bar_csv
+
+###parquet store
+def _require_pyarrow():
+    if pq is None:
+        raise ImportError("The Parquet bar store requires pyarrow")
+
+
+def convert_csv_dir(csv_dir, store_dir, symbol_list=None,
+                    row_group_size=1440):
+    """
+    Converts the csv_dir layout into a Parquet store partitioned by
+    symbol and month: store_dir/<symbol>/<YYYY-MM>.parquet. Each file
+    is split into row groups of row_group_size bars, whose min/max
+    statistics let readers skip the groups outside a date range.
+
+    Parameters:
+    csv_dir - Directory of <symbol>.csv files.
+    store_dir - Directory to write the store to.
+    symbol_list - Symbols to convert, every CSV file by default.
+    row_group_size - Bars per row group, about one day by default.
+    """
+    _require_pyarrow()
+    if symbol_list is None:
+        symbol_list = sorted(f[:-4] for f in os.listdir(csv_dir)
+                             if f.endswith(".csv"))
+    for s in symbol_list:
+        df = _read_bar_csv(os.path.join(csv_dir, '%s.csv' % s))
+        symbol_dir = os.path.join(store_dir, s)
+        if not os.path.isdir(symbol_dir):
+            os.makedirs(symbol_dir)
+        months = df.index.strftime("%Y-%m")
+        for month in np.unique(months):
+            part = df[months == month]
+            table = pa.Table.from_pandas(part.reset_index(),
+                                         preserve_index=False)
+            pq.write_table(table,
+                           os.path.join(symbol_dir, '%s.parquet' % month),
+                           row_group_size=row_group_size)
+
+
+def partition_files(store_dir, symbol, start_date, end_date):
+    """
+    Returns the sorted month files of a symbol that overlap
+    [start_date, end_date].
+    """
+    first = pd.Timestamp(start_date).strftime("%Y-%m")
+    last = pd.Timestamp(end_date).strftime("%Y-%m")
+    symbol_dir = os.path.join(store_dir, symbol)
+    return [os.path.join(symbol_dir, f) for f in sorted(os.listdir(symbol_dir))
+            if f.endswith(".parquet") and first <= f[:-8] <= last]
+
+
+def earlier_partition_files(store_dir, symbol, start_date):
+    """
+    Returns the newest month file of a symbol before the month of
+    start_date as a one-item list, or an empty list if there is none.
+    """
+    first = pd.Timestamp(start_date).strftime("%Y-%m")
+    symbol_dir = os.path.join(store_dir, symbol)
+    earlier = [f for f in sorted(os.listdir(symbol_dir))
+               if f.endswith(".parquet") and f[:-8] < first]
+    return [os.path.join(symbol_dir, f) for f in earlier[-1:]]
+
+
+def _last_bar_before(store_dir, symbol, start_date, columns):
+    """
+    Returns the last bar of a symbol before start_date as a
+    one-row table, reading only the last row group of the newest
+    earlier month file, or None if there is none.
+    """
+    earlier = earlier_partition_files(store_dir, symbol, start_date)
+    if not earlier:
+        return None
+    pf = pq.ParquetFile(earlier[0])
+    table = pf.read_row_group(pf.num_row_groups - 1, columns=columns)
+    return table.slice(table.num_rows - 1)
+
+
+def read_bars(store_dir, symbol, start_date, end_date, columns=None):
+    """
+    Reads the bars of a symbol between start_date and end_date from
+    the store into a DataFrame indexed on datetime.
+
+    Only the month files overlapping the range are opened, only the
+    requested columns are decoded and the date filter is pushed down
+    to the row groups. The bars of the day of the last bar before
+    start_date are included as well, so forward-filling onto the
+    session grid starts from the right value and aggregated bars
+    starting before it are complete. Fields left out of columns are
+    zero.
+    """
+    _require_pyarrow()
+    columns = list(BAR_FIELDS if columns is None else columns)
+    read_columns = ['datetime'] + columns
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    tables = [
+        pq.read_table(path, columns=read_columns,
+                      filters=[('datetime', '>=', start),
+                               ('datetime', '<=', end)])
+        for path in partition_files(store_dir, symbol, start, end)
+    ]
+    tables = [t for t in tables if t.num_rows]
+    # The last bar before the range is in the month of start or,
+    # failing that, in the newest earlier month
+    head = None
+    month = partition_files(store_dir, symbol, start, start)
+    if month:
+        head = pq.read_table(month[0], columns=read_columns,
+                             filters=[('datetime', '<', start)])
+        head = head.slice(head.num_rows - 1) if head.num_rows else None
+    if head is None:
+        head = _last_bar_before(store_dir, symbol, start, read_columns)
+    if head is not None:
+        # Then the rest of its day
+        day = pd.Timestamp(head.column('datetime')[0].as_py()).normalize()
+        tables[:0] = [
+            pq.read_table(path, columns=read_columns,
+                          filters=[('datetime', '>=', day),
+                                   ('datetime', '<', start)])
+            for path in partition_files(store_dir, symbol, day, start)
+        ]
+        tables = [t for t in tables if t.num_rows]
+
+    if tables:
+        df = pa.concat_tables(tables).to_pandas().set_index('datetime')
+    else:
+        df = pd.DataFrame(columns=read_columns).set_index('datetime')
+    for f in BAR_FIELDS:
+        if f not in columns:
+            df[f] = 0.0
+    df.index = pd.DatetimeIndex(df.index)
+    return df[list(BAR_FIELDS)].sort_index()
+
+
+def _load_bar_parquet(source, time_index, align):
+    """
+    Reads a symbol from the Parquet store and aligns it with
+    align(df, time_index). Module level so that it can run in a
+    process pool.
+    """
+    store_dir, symbol, start_date, end_date, columns = source
+    return align(read_bars(store_dir, symbol, start_date, end_date, columns),
+                 time_index)
+
+
+class ParquetDataHandler(HistoricCSVDataHandler):
+    """
+    ParquetDataHandler is a HistoricCSVDataHandler that reads its
+    bars from a Parquet store written by convert_csv_dir() instead of
+    CSV files, touching only the months, row groups and columns the
+    requested date range needs.
+    """
+
+    _load_bars = staticmethod(_load_bar_parquet)
+
+    def __init__(self, events, store_dir, symbol_list, columns=None,
+                 **kwargs):
+        """
+        Initialises the Parquet data handler.
+
+        Parameters:
+        events - The Event Queue.
+        store_dir - Directory of the Parquet store.
+        symbol_list - A list of symbol strings.
+        columns - Fields to read, all of BAR_FIELDS by default. The
+        others are left at zero.
+
+        The other keyword arguments are those of
+        HistoricCSVDataHandler; data_start_date and data_end_date
+        select the range that is read.
+        """
+        _require_pyarrow()
+        self.columns = columns
+        HistoricCSVDataHandler.__init__(self, events, store_dir, symbol_list,
+                                        **kwargs)
+
+    def _symbol_source(self, symbol):
+        """
+        Returns what _load_bars() reads for a symbol.
+        """
+        return (self.csv_dir, symbol, self.data_start_date,
+                self.data_end_date, self.columns)
+
+    def _cache_sources(self, symbol):
+        """
+        Returns the files the cached arrays of a symbol depend on,
+        including the earlier month file read_bars() may take the
+        bar before data_start_date and the rest of its day from.
+        """
+        return earlier_partition_files(self.csv_dir, symbol,
+                                       self.data_start_date) + \
+            partition_files(self.csv_dir, symbol, self.data_start_date,
+                            self.data_end_date) + \
+            [self.calendar.standard_csv]
+
+    def _cache_params(self):
+        """
+        Returns the parameters the cached arrays depend on.
+        """
+        params = HistoricCSVDataHandler._cache_params(self)
+        params["columns"] = self.columns
+        return params
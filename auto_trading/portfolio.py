@@ -5,9 +5,10 @@ Created on Sat Mar 27 11:16:47 2021
 @author: Bear
 """
 
+import numpy as np
 import pandas as pd
 
-from event import OrderEvent
+from event import MarketEvent, OrderEvent
 from performance import create_sharpe_ratio, create_drawdowns,create_sortino_ratio, \
     create_skewness,create_kurtosis,create_calmar_ratio
 
@@ -24,7 +25,10 @@ class Portfolio(object):
     time-index, as well as the percentage change in
     portfolio total across bars.
     """
-    def __init__(self, bars, events, start_date, initial_capital=5000000.0):
+    mkt_quantity = 100  # contracts per naive order
+    
+    def __init__(self, bars, events, start_date, initial_capital=5000000.0,
+                 fee_model=None):
         """
         Initialises the portfolio with bars and an event queue.
         Also includes a starting datetime index and initial capital
@@ -34,12 +38,16 @@ class Portfolio(object):
         events - The Event Queue object.
         start_date - The start date (bar) of the portfolio.
         initial_capital - The starting capital in USD.
+        fee_model - Optional fee_model(symbol, price, quantity), e.g.
+        fees.taifex_trade_fee, charged on every fill at the fill price
+        instead of the commission the fill carries.
         """
         self.bars = bars
         self.events = events
         self.symbol_list = self.bars.symbol_list
         self.start_date = start_date
         self.initial_capital = initial_capital
+        self.fee_model = fee_model
         self.all_positions = self.construct_all_positions()
         self.current_positions = dict( (k,v) for k, v in \
                                       [(s, 0) for s in self.symbol_list] )
@@ -84,10 +92,14 @@ class Portfolio(object):
         market data bar. This reflects the PREVIOUS bar, i.e. all
         current market data at this stage is known (OHLCV).
         
-        Makes use of a MarketEvent from the events queue.
+        Makes use of a MarketEvent from the events queue. An event
+        naming no symbols brings no new bar and adds no record.
         """
+        if event.symbols is not None and not event.symbols:
+            return
+        # Symbols named by the event all share the newest timestamp
         latest_datetime = self.bars.get_latest_bar_datetime(
-            self.symbol_list[0] # maybe have some trouble in future
+            event.symbols[0] if event.symbols else self.symbol_list[0]
         )
         
         # Update positions
@@ -109,16 +121,36 @@ class Portfolio(object):
         dh['commission'] = self.current_holdings['commission']
         dh['total'] = self.current_holdings['cash']
         
-        for s in self.symbol_list:
-            # Approximation to the real value
-            market_value = self.current_positions[s] * \
-                self.bars.get_latest_bar_value(s, "adj_close")
+        positions = np.array([self.current_positions[s]
+                              for s in self.symbol_list])
+        if positions.any():
+            # Approximation to the real value, one vector for all symbols
+            prices = self.bars.get_latest_values("adj_close")
+            # Nothing held is worth 0, even without a bar yet
+            market = np.where(positions != 0, positions * prices, 0.0)
+        else:
+            market = np.zeros(len(self.symbol_list))
+        for s, market_value in zip(self.symbol_list, market.tolist()):
             dh[s] = market_value
             dh['total'] += market_value  #this value reset above to current cash
         
         # Append the current holdings
         self.all_holdings.append(dh) #"ticker", "datetime", "cash", "commission", "total"
 
+    def update_timeindex_span(self, datetimes):
+        """
+        Adds the records of the bars at datetimes, which the engine
+        passed over because no bar changed (see
+        DataHandler.skip_bars()). Positions, cash and prices are the
+        same at all of them, so the record of the latest bar is
+        computed once and repeated with each datetime.
+        """
+        self.update_timeindex(MarketEvent.ALL)
+        dp = self.all_positions.pop()
+        dh = self.all_holdings.pop()
+        self.all_positions.extend(dict(dp, datetime=dt) for dt in datetimes)
+        self.all_holdings.extend(dict(dh, datetime=dt) for dt in datetimes)
+
     def update_positions_from_fill(self, fill):
         """
         Takes a Fill object and updates the position matrix to
@@ -155,10 +187,14 @@ class Portfolio(object):
         # Update holdings list with new quantities
         fill_cost = self.bars.get_latest_bar_value(fill.symbol, "adj_close")
         cost = fill_dir * fill_cost * fill.quantity
+        commission = fill.commission
+        if self.fee_model is not None:
+            commission = float(self.fee_model(fill.symbol, fill_cost,
+                                              fill.quantity))
         self.current_holdings[fill.symbol] += cost
-        self.current_holdings['commission'] += fill.commission
-        self.current_holdings['cash'] -= (cost + fill.commission)
-        self.current_holdings['total'] -= (cost + fill.commission)
+        self.current_holdings['commission'] += commission
+        self.current_holdings['cash'] -= (cost + commission)
+        self.current_holdings['total'] -= (cost + commission)
 
     def update_fill(self, event):
         """
@@ -182,17 +218,17 @@ class Portfolio(object):
         symbol = signal.symbol
         direction = signal.signal_type
         strength = signal.strength
-        mkt_quantity = 100
+        mkt_quantity = self.mkt_quantity
         cur_quantity = self.current_positions[symbol]
         order_type = "MKT"
         if direction == "LONG" and cur_quantity == 0:
-            order = OrderEvent(symbol, order_type, mkt_quantity, "BUY")
+            order = OrderEvent.create(symbol, order_type, mkt_quantity, "BUY")
         if direction == "SHORT" and cur_quantity == 0:
-            order = OrderEvent(symbol, order_type, mkt_quantity, "SELL")
+            order = OrderEvent.create(symbol, order_type, mkt_quantity, "SELL")
         if direction == "EXIT" and cur_quantity > 0:
-            order = OrderEvent(symbol, order_type, abs(cur_quantity), "SELL")
+            order = OrderEvent.create(symbol, order_type, abs(cur_quantity), "SELL")
         if direction == "EXIT" and cur_quantity < 0:
-            order = OrderEvent(symbol, order_type, abs(cur_quantity), "BUY")
+            order = OrderEvent.create(symbol, order_type, abs(cur_quantity), "BUY")
         return order
 
     def update_signal(self, event):
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:03:26 2026
+"""
+import queue
+import time
+
+from data import DataHandler, StreamingCSVDataHandler
+from tick_data import TickDataHandler
+
+###replay
+class ReplayClock(object):
+    """
+    ReplayClock paces a recording on a monotonic clock, `speed`
+    times faster than it was recorded.
+
+    The first timestamp is anchored to the current clock reading
+    and every later one is waited for against that anchor, not
+    relative to the previous wait, so oversleeping and processing
+    time do not accumulate into drift. How late each wake-up was is
+    kept in `lag` and `max_lag`.
+    """
+
+    def __init__(self, speed=1.0, clock=time.monotonic, sleep=time.sleep):
+        """
+        Initialises the clock.
+
+        Parameters:
+        speed - Replay speed multiplier, e.g. 60.0 for an hour of
+        recording per minute. None replays without waiting.
+        clock - Monotonic clock returning seconds.
+        sleep - Function sleeping for a number of seconds.
+        """
+        self.speed = speed
+        self.clock = clock
+        self.sleep = sleep
+        self._anchor = None  # (recording ns, clock seconds)
+        self.lag = 0.0       # seconds the last wake-up was late
+        self.max_lag = 0.0
+
+    def wait_until(self, timestamp):
+        """
+        Waits until the replayed time reaches timestamp, given in
+        epoch nanoseconds of the recording. Returns at once for
+        timestamps already passed.
+        """
+        if self.speed is None:
+            return
+        if self._anchor is None:
+            self._anchor = (timestamp, self.clock())
+            return
+        target = self._anchor[1] + \
+            (timestamp - self._anchor[0]) / 1e9 / self.speed
+        remaining = target - self.clock()
+        if remaining > 0:
+            self.sleep(remaining)
+        self.lag = max(self.clock() - target, 0.0)
+        self.max_lag = max(self.max_lag, self.lag)
+
+
+class ReplayDataHandler(DataHandler):
+    """
+    ReplayDataHandler replays a recorded session through the
+    DataHandler interface at live pacing, or a multiple of it, to
+    soak-test the live path.
+
+    The recording is read by an incremental handler: a CSV
+    directory of minute bars by StreamingCSVDataHandler, or a tick
+    file by TickDataHandler. Each MarketEvent it produces is held
+    back until the ReplayClock reaches the timestamp of the new bar,
+    then passed on to the events queue. Use it with a zero backtest
+    heartbeat, the clock does the waiting.
+    """
+
+    def __init__(self, events, recording, symbol_list, speed=1.0,
+                 kind="bars", clock=None, **kwargs):
+        """
+        Initialises the replay data handler.
+
+        Parameters:
+        events - The Event Queue.
+        recording - The CSV directory for "bars", the tick file for
+        "ticks".
+        symbol_list - A list of symbol strings.
+        speed - Replay speed multiplier, None for no waiting.
+        kind - "bars" or "ticks".
+        clock - An optional ReplayClock, which overrides speed.
+
+        The other keyword arguments go to the handler reading the
+        recording.
+        """
+        self.events = events
+        self.symbol_list = symbol_list
+        self.clock = clock if clock is not None else ReplayClock(speed)
+        self._feed_events = queue.Queue()
+        if kind == "ticks":
+            self.feed = TickDataHandler(self._feed_events, recording,
+                                        symbol_list, **kwargs)
+        elif kind == "bars":
+            self.feed = StreamingCSVDataHandler(self._feed_events, recording,
+                                                symbol_list, **kwargs)
+        else:
+            raise ValueError("Unknown recording kind %s" % kind)
+        self.continue_backtest = True
+
+    def get_latest_bar(self, symbol):
+        return self.feed.get_latest_bar(symbol)
+
+    def get_latest_bars(self, symbol, N=1):
+        return self.feed.get_latest_bars(symbol, N)
+
+    def get_latest_bar_datetime(self, symbol):
+        return self.feed.get_latest_bar_datetime(symbol)
+
+    def get_latest_bar_value(self, symbol, val_type):
+        return self.feed.get_latest_bar_value(symbol, val_type)
+
+    def get_latest_bars_values(self, symbol, val_type, N=1):
+        return self.feed.get_latest_bars_values(symbol, val_type, N)
+
+    def get_latest_bars_fields(self, symbol, N=1, val_types=None):
+        return self.feed.get_latest_bars_fields(symbol, N, val_types)
+
+    def update_bars(self):
+        """
+        Reads the next bar of the recording, waits until its time
+        on the replay clock and sends its MarketEvent.
+        """
+        self.feed.update_bars()
+        self.continue_backtest = self.feed.continue_backtest
+        while True:
+            try:
+                event = self._feed_events.get(False)
+            except queue.Empty:
+                break
+            if self.continue_backtest:
+                symbols = event.symbols or self.symbol_list
+                timestamp = self.feed.get_latest_bar_datetime(symbols[0])
+                self.clock.wait_until(timestamp.value)
+            self.events.put(event)
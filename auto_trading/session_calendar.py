@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:02:47 2026
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+###session calendar
+class SessionCalendar(object):
+    """
+    SessionCalendar builds the minute grid of the TAIFEX day session
+    that every symbol is aligned to.
+
+    The trading days are taken from a standard CSV (TXFF1.csv by
+    default), the minutes of each day from the session bounds. All
+    of the work is done with vectorised datetime arithmetic.
+    """
+
+    def __init__(self, standard_csv="TXFF1.csv",
+                 session_start=datetime.time(8, 46),
+                 session_end=datetime.time(13, 45)):
+        """
+        Initialises the calendar. The trading days are only read
+        from the standard CSV when they are first needed.
+
+        Parameters:
+        standard_csv - CSV whose "Date" column defines the trading days.
+        session_start - First minute of the session (inclusive).
+        session_end - Last minute of the session (inclusive).
+        """
+        self.standard_csv = standard_csv
+        self.session_start = session_start
+        self.session_end = session_end
+        self._trading_days = None
+
+    @property
+    def trading_days(self):
+        """
+        The trading days of the standard CSV, loaded on first use.
+        """
+        if self._trading_days is None:
+            self._trading_days = self._load_trading_days()
+        return self._trading_days
+
+    def _time_of_day_mask(self, index):
+        """
+        Returns a boolean mask of the timestamps in index that
+        fall within the session, both bounds included.
+        """
+        time_of_day = index - index.normalize()
+        start = pd.Timedelta(hours=self.session_start.hour,
+                             minutes=self.session_start.minute)
+        end = pd.Timedelta(hours=self.session_end.hour,
+                           minutes=self.session_end.minute)
+        return (time_of_day >= start) & (time_of_day <= end)
+
+    def _load_trading_days(self, offset=0):
+        """
+        Returns the sorted unique dates of the standard CSV that have
+        at least one bar inside the session, reading only the rows
+        after byte offset when it is not 0.
+        """
+        with open(self.standard_csv, "rb") as f:
+            names = f.readline().decode().strip().split(",")
+            if offset:
+                f.seek(offset)
+            if not f.read(1):
+                return pd.DatetimeIndex([])
+            f.seek(-1, 1)
+            stamps = pd.DatetimeIndex(
+                pd.read_csv(f, header=None, names=names,
+                            usecols=["Date"])["Date"]
+            )
+        stamps = stamps[self._time_of_day_mask(stamps)]
+        return stamps.normalize().unique().sort_values()
+
+    def minutes(self, start_date, end_date):
+        """
+        Returns a DatetimeIndex of every session minute between
+        start_date and end_date (both inclusive) on a trading day.
+        """
+        grid = pd.date_range(start_date, end_date, freq="min")
+        mask = self._time_of_day_mask(grid) & \
+            grid.normalize().isin(self.trading_days)
+        return grid[mask]
+
+    def extend_minutes(self, minutes, offset, start_date, end_date):
+        """
+        Extends minutes, the grid minutes(start_date, end_date) gave
+        while the standard CSV was offset bytes long, with the
+        trading days of the rows appended to it since. Only those
+        rows are parsed.
+        """
+        days = self._load_trading_days(offset)
+        if len(minutes) > 0:
+            days = days[days > minutes[-1].normalize()]
+        first = pd.Timedelta(hours=self.session_start.hour,
+                             minutes=self.session_start.minute)
+        last = pd.Timedelta(hours=self.session_end.hour,
+                            minutes=self.session_end.minute)
+        n = (last - first) // pd.Timedelta(minutes=1) + 1
+        grid = pd.DatetimeIndex(
+            (days.values[:, None] + first +
+             pd.Timedelta(minutes=1) * np.arange(n)).ravel()
+        )
+        grid = grid[(grid >= pd.Timestamp(start_date)) &
+                    (grid <= pd.Timestamp(end_date))]
+        return minutes.append(grid)
+
+    def iter_day_minutes(self, start_date, end_date):
+        """
+        Yields the session minutes between start_date and end_date
+        one trading day at a time, so long spans never have to be
+        built in one piece.
+        """
+        start_date = pd.Timestamp(start_date)
+        end_date = pd.Timestamp(end_date)
+        first = pd.Timedelta(hours=self.session_start.hour,
+                             minutes=self.session_start.minute)
+        last = pd.Timedelta(hours=self.session_end.hour,
+                            minutes=self.session_end.minute)
+        days = self.trading_days
+        days = days[(days >= start_date.normalize()) & (days <= end_date)]
+        for day in days:
+            minutes = self.minutes(max(start_date, day + first),
+                                   min(end_date, day + last))
+            if len(minutes) > 0:
+                yield minutes
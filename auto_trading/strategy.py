@@ -7,6 +7,9 @@ Created on Sat Mar 27 11:08:37 2021
 
 from abc import ABCMeta, abstractmethod
 
+# Codes of the signal arrays of calculate_signals_vectorized(), 0 for
+# no signal
+SIGNAL_CODES = {"LONG": 1, "SHORT": -1, "EXIT": 2}
 
 class Strategy(object):
     """
@@ -22,9 +25,28 @@ class Strategy(object):
     
     __metaclass__ = ABCMeta
     
+    # Set to the number of latest bars calculate_signals() reads to
+    # declare that it sends no signals and changes nothing when those
+    # bars of every symbol are the same as on the previous bar. The
+    # backtest then skips such bars in bulk.
+    idle_lookback = None
+    
     @abstractmethod
     def calculate_signals(self):
         """
         Provides the mechanisms to calculate the list of signals.
         """
-        raise NotImplementedError("Should implement calculate_signals()")
\ No newline at end of file
+        raise NotImplementedError("Should implement calculate_signals()")
+
+    def calculate_signals_vectorized(self, steps):
+        """
+        Optional. Returns every signal of a backtest at once, for
+        VectorizedBacktest: an int8 (symbols, len(steps)) array of
+        SIGNAL_CODES, column k holding the signals calculate_signals()
+        would send for the k-th MarketEvent, whose latest bar is at
+        position steps[k] of every symbol. Leaves the strategy in the
+        state it would be in after the last of them.
+        """
+        raise NotImplementedError(
+            "Should implement calculate_signals_vectorized()"
+        )
\ No newline at end of file
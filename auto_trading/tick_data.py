@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:32:41 2026
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from data import BufferedDataHandler
+from event import MarketEvent
+from bar_aggregation import MINUTE_NS, DAY_NS, _time_ns
+
+###tick data
+class TickBarBuilder(object):
+    """
+    TickBarBuilder turns the ticks of one symbol into minute bars
+    in O(1) per tick, holding only the bar being built.
+
+    A minute bar is labelled with its closing minute, like the bars
+    in csv_dir: ticks from 08:45:00 (exclusive) to 08:46:00
+    (inclusive) make the 08:46 bar.
+    """
+
+    def __init__(self):
+        self.label = None  # label of the bar being built
+        self.open = self.high = self.low = self.close = 0.0
+        self.volume = 0.0
+
+    @staticmethod
+    def minute_label(timestamp):
+        """
+        Returns the label of the minute bar an epoch-nanosecond
+        tick timestamp belongs to.
+        """
+        return timestamp + (-timestamp) % MINUTE_NS
+
+    def update(self, timestamp, price, volume):
+        """
+        Adds a tick. Returns the (label, bar) tuple of the bar it
+        completed if the tick starts a new minute, otherwise None.
+        """
+        label = self.minute_label(timestamp)
+        done = None
+        if label != self.label:
+            done = self.flush()
+            self.label = label
+            self.open = self.high = self.low = self.close = price
+            self.volume = volume
+        else:
+            if price > self.high:
+                self.high = price
+            elif price < self.low:
+                self.low = price
+            self.close = price
+            self.volume += volume
+        return done
+
+    def flush(self):
+        """
+        Completes the bar being built and returns it as a
+        (label, bar) tuple in BAR_FIELDS order, or None.
+        """
+        if self.label is None:
+            return None
+        done = (self.label, (self.open, self.high, self.low, self.close,
+                             self.close, self.volume))
+        self.label = None
+        return done
+
+
+class TickDataHandler(BufferedDataHandler):
+    """
+    TickDataHandler replays a recorded tick file through the
+    standard DataHandler interface.
+
+    The file is a CSV with a header and the columns datetime,
+    symbol, price and volume, sorted by time. It is read in chunks,
+    so memory holds one chunk, the bars being built and the ring
+    buffers, however many ticks the session has. Every symbol's
+    minute bar is closed as soon as any tick of a later minute
+    arrives, and one MarketEvent naming the symbols that got a new
+    bar is sent per closed minute (or per aggregated bar when
+    bar_size is not 1).
+    """
+
+    def __init__(self, events, tick_file, symbol_list, bar_size=1,
+                 max_lookback=500, chunksize=100000,
+                 session_start=datetime.time(8, 46),
+                 session_end=datetime.time(13, 45)):
+        """
+        Initialises the tick data handler.
+
+        Parameters:
+        events - The Event Queue.
+        tick_file - Path of the recorded tick CSV.
+        symbol_list - A list of symbol strings; other symbols in
+        the file are ignored.
+        bar_size - Minutes per bar, or "D" for one bar per session.
+        max_lookback - The most bars get_latest_bars* can return.
+        chunksize - Number of ticks parsed at a time.
+        session_start - First minute bar of the session.
+        session_end - Last minute bar of the session.
+        """
+        BufferedDataHandler.__init__(self, events, symbol_list, max_lookback,
+                                     bar_size, session_start, session_end)
+        self.tick_file = tick_file
+        self.chunksize = chunksize
+        self.session_start = session_start
+        self.session_end = session_end
+        self.builders = dict((s, TickBarBuilder()) for s in self.symbol_list)
+        self.updated_symbols = []
+        self._open_label = None  # minute currently being built
+        self._ticks = self._read_ticks()
+
+    def _read_ticks(self):
+        """
+        Yields (timestamp, symbol, price, volume) for every tick of
+        the file whose minute bar falls inside the session.
+        """
+        first = _time_ns(self.session_start)
+        last = _time_ns(self.session_end)
+        reader = pd.read_csv(
+            self.tick_file, header=0,
+            names=['datetime', 'symbol', 'price', 'volume'],
+            chunksize=self.chunksize
+        )
+        for chunk in reader:
+            chunk = chunk[chunk['symbol'].isin(self.symbol_list)]
+            ts = np.asarray(pd.to_datetime(chunk['datetime']).values,
+                            dtype='datetime64[ns]').view(np.int64)
+            label = ts + (-ts) % MINUTE_NS
+            time_of_day = label % DAY_NS
+            keep = (time_of_day >= first) & (time_of_day <= last)
+            for tick in zip(ts[keep].tolist(),
+                            chunk['symbol'].values[keep].tolist(),
+                            chunk['price'].values[keep].astype(float).tolist(),
+                            chunk['volume'].values[keep].astype(float).tolist()):
+                yield tick
+
+    def _close_minute(self):
+        """
+        Completes the open minute bar of every symbol and pushes
+        them. Returns the symbols whose history got a new bar.
+        """
+        updated = []
+        for s in self.symbol_list:
+            done = self.builders[s].flush()
+            if done is not None and self._push_bar(s, done[0], done[1]):
+                updated.append(s)
+        self._open_label = None
+        return updated
+
+    def update_bars(self):
+        """
+        Consumes ticks until at least one symbol has a new bar,
+        then sends a MarketEvent naming those symbols. Sends nothing
+        once the ticks are exhausted and every bar is out.
+        """
+        self.updated_symbols = []
+        while not self.updated_symbols:
+            try:
+                ts, symbol, price, volume = next(self._ticks)
+            except StopIteration:
+                updated = set(self._close_minute() + self._flush_bars())
+                self.updated_symbols = [s for s in self.symbol_list
+                                        if s in updated]
+                if not self.updated_symbols:
+                    self.continue_backtest = False
+                    return
+                break
+            if self._open_label is not None and ts > self._open_label:
+                self.updated_symbols = self._close_minute()
+            self.builders[symbol].update(ts, price, volume)
+            self._open_label = self.builders[symbol].label
+        self.events.put(MarketEvent(self.updated_symbols))
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:48:36 2026
+"""
+import contextlib
+import datetime
+import functools
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from backtest import Backtest
+from data import HistoricCSVDataHandler
+from execution import SimulatedExecutionHandler
+from fees import ib_commission, taifex_trade_fee
+from mac import MovingAverageCrossStrategy
+from portfolio import Portfolio
+from strategy import SIGNAL_CODES
+
+###vectorized backtest
+def naive_positions(signals, quantity):
+    """
+    Returns the (symbols, steps) positions held after the signals
+    of each step, as Portfolio.generate_naive_order() trades them:
+    LONG and SHORT open a position of quantity when flat and are
+    ignored otherwise, EXIT goes flat.
+    """
+    idx = np.arange(signals.shape[1])
+    exits = signals == SIGNAL_CODES["EXIT"]
+    entries = (signals != 0) & ~exits
+    # Last exit up to each step, and the entries counted until then
+    last_exit = np.maximum.accumulate(np.where(exits, idx, -1), axis=1)
+    entry_count = np.cumsum(entries, axis=1)
+    count_at_exit = np.where(
+        last_exit >= 0,
+        np.take_along_axis(entry_count, np.maximum(last_exit, 0), axis=1), 0
+    )
+    # An entry opens a position if no entry came since the last exit
+    opens = entries & (entry_count - entries == count_at_exit)
+    last_open = np.maximum.accumulate(np.where(opens, idx, -1), axis=1)
+    direction = np.take_along_axis(signals, np.maximum(last_open, 0), axis=1)
+    return np.where(last_open > last_exit, direction.astype(np.int64) * quantity,
+                    0)
+
+
+class VectorizedBacktest(Backtest):
+    """
+    VectorizedBacktest runs the same components as Backtest, but
+    computes the whole run with array operations instead of sending
+    events bar by bar: the strategy's calculate_signals_vectorized()
+    gives every signal, and the positions, fills, commissions and
+    holdings of the naive Portfolio and SimulatedExecutionHandler
+    follow from them.
+
+    The results land where the event loop puts them (all_positions,
+    all_holdings, the current positions and holdings, the signal,
+    order and fill counts), with the same values, so the reporting
+    of Portfolio works unchanged; see check_parity(). Only a data
+    handler that moves every symbol on together, like
+    HistoricCSVDataHandler, is supported, and nothing can subscribe
+    to events since none are sent.
+    """
+
+    def __init__(self, *args, **kwargs):
+        Backtest.__init__(self, *args, **kwargs)
+        self._check_components()
+
+    def _check_components(self):
+        """
+        Raises a ValueError unless the components behave like the
+        ones the vectorized run reproduces.
+        """
+        handler = type(self.data_handler)
+        if handler.update_bars is not HistoricCSVDataHandler.update_bars or \
+                handler._latest_index is not HistoricCSVDataHandler._latest_index:
+            raise ValueError(
+                "VectorizedBacktest needs a data handler that updates every "
+                "symbol on every bar, such as HistoricCSVDataHandler"
+            )
+        for name in ("update_timeindex", "update_signal", "update_fill",
+                     "generate_naive_order", "update_positions_from_fill",
+                     "update_holdings_from_fill"):
+            if getattr(type(self.portfolio), name) is not \
+                    getattr(Portfolio, name):
+                raise ValueError(
+                    "VectorizedBacktest cannot reproduce %s.%s" %
+                    (type(self.portfolio).__name__, name)
+                )
+        if type(self.execution_handler).execute_order is not \
+                SimulatedExecutionHandler.execute_order:
+            raise ValueError(
+                "VectorizedBacktest needs a SimulatedExecutionHandler"
+            )
+
+    def subscribe(self, event_cls, handler):
+        raise ValueError("VectorizedBacktest does not send events")
+
+    def _run_backtest(self):
+        """
+        Executes the backtest.
+        """
+        bars = self.data_handler
+        portfolio = self.portfolio
+        symbols = self.symbol_list
+        n = len(bars._get_store(symbols[0]))
+        if n == 0:
+            raise IndexError("No bar has been updated yet.")
+        # The last update_bars() of the event loop sends the last bar again
+        steps = np.r_[np.arange(n), n - 1]
+
+        signals = self.strategy.calculate_signals_vectorized(steps)
+        positions = naive_positions(signals, portfolio.mkt_quantity)
+        held = np.zeros_like(positions)  # positions before each step's fills
+        held[:, 1:] = positions[:, :-1]
+
+        # Fills in the order the event loop sends them: by step, then
+        # by symbol
+        fill_step, fill_symbol = np.nonzero((positions - held).T)
+        quantity = (positions - held)[fill_symbol, fill_step]
+        fill_dir = np.sign(quantity)
+        quantity = np.abs(quantity)
+        prices = np.array([bars._get_store(s).values("adj_close", 0, n)[steps]
+                           for s in symbols])
+        fill_price = prices[fill_symbol, fill_step]
+        cost = fill_dir * fill_price * quantity
+        commission = np.empty(len(quantity))
+        for k, s in enumerate(symbols):
+            mask = fill_symbol == k
+            if portfolio.fee_model is None:
+                commission[mask] = ib_commission(s, fill_price[mask],
+                                                 quantity[mask])
+            else:
+                commission[mask] = portfolio.fee_model(s, fill_price[mask],
+                                                       quantity[mask])
+
+        # Running cash and commission after each fill, taken just
+        # before the fills of every step
+        cash = np.subtract.accumulate(
+            np.r_[portfolio.initial_capital, cost + commission]
+        )
+        paid = np.add.accumulate(np.r_[0.0, commission])
+        before = np.searchsorted(fill_step, np.arange(len(steps)), 'left')
+        market = np.where(held != 0, held * prices, 0.0)
+        total = cash[before]
+        for k in range(len(symbols)):
+            total = total + market[k]
+
+        timestamps = bars._get_store(symbols[0]).timestamps[steps]
+        dts = list(pd.DatetimeIndex(timestamps.view('datetime64[ns]')))
+        columns = [held[k].tolist() for k in range(len(symbols))] + [dts]
+        portfolio.all_positions.extend(
+            dict(zip(symbols + ['datetime'], row)) for row in zip(*columns)
+        )
+        columns = [market[k].tolist() for k in range(len(symbols))] + \
+            [dts, cash[before].tolist(), paid[before].tolist(), total.tolist()]
+        portfolio.all_holdings.extend(
+            dict(zip(symbols + ['datetime', 'cash', 'commission', 'total'],
+                     row))
+            for row in zip(*columns)
+        )
+
+        for k, s in enumerate(symbols):
+            portfolio.current_positions[s] = int(positions[k, -1])
+            portfolio.current_holdings[s] = float(
+                np.add.accumulate(np.r_[0.0, cost[fill_symbol == k]])[-1]
+            )
+        portfolio.current_holdings['cash'] = float(cash[-1])
+        portfolio.current_holdings['commission'] = float(paid[-1])
+        portfolio.current_holdings['total'] = float(cash[-1])
+
+        bars.bar_index = n - 1
+        bars.continue_backtest = False
+        self.signals = int(np.count_nonzero(signals))
+        self.orders = len(quantity)
+        self.fills = len(quantity)
+
+
+def check_parity(csv_dir, symbol_list, initial_capital, start_date,
+                 data_handler, execution_handler, portfolio, strategy):
+    """
+    Runs a backtest both event by event and vectorized, and asserts
+    that the equity curves and the signal, order and fill counts
+    are identical. Returns the (Backtest, VectorizedBacktest) pair.
+    """
+    runs = []
+    for engine in (Backtest, VectorizedBacktest):
+        t = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            backtest = engine(csv_dir, symbol_list, initial_capital, 0.0,
+                              start_date, data_handler, execution_handler,
+                              portfolio, strategy)
+            backtest._run_backtest()
+        backtest.portfolio.create_equity_curve_dataframe()
+        print("%s: %.2fs" % (engine.__name__, time.time() - t))
+        runs.append(backtest)
+    event_run, vectorized_run = runs
+    pd.testing.assert_frame_equal(event_run.portfolio.equity_curve,
+                                  vectorized_run.portfolio.equity_curve,
+                                  check_exact=True)
+    for count in ("signals", "orders", "fills"):
+        assert getattr(event_run, count) == getattr(vectorized_run, count), \
+            "%s differ" % count
+    return event_run, vectorized_run
+
+
+if __name__ == "__main__":
+    csv_dir = "csv_dir"
+    symbol_list = sorted(f[:-len(".csv")] for f in os.listdir(csv_dir)
+                         if f.endswith(".csv"))
+    initial_capital = 5000000.0
+    start_date = datetime.datetime(2020, 3, 23, 0, 0, 0)
+    for fees in (None, taifex_trade_fee):
+        check_parity(csv_dir, symbol_list, initial_capital, start_date,
+                     HistoricCSVDataHandler, SimulatedExecutionHandler,
+                     functools.partial(Portfolio, fee_model=fees),
+                     MovingAverageCrossStrategy)
+        print("Equity curves identical, fee model %s" %
+              (fees.__name__ if fees is not None else "of the fills"))